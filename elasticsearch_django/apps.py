@@ -4,6 +4,7 @@ import logging
 from typing import TYPE_CHECKING, Any
 
 from django.apps import AppConfig
+from django.core.cache import cache
 from django.core.exceptions import ImproperlyConfigured
 from django.db.models import Model, signals
 
@@ -106,10 +107,34 @@ def _on_model_delete(sender: type[Model], **kwargs: Any) -> None:
             logger.exception("Error handling 'on_delete' signal for %s", instance)
 
 
+def _in_search_queryset_cache_key(instance: SearchDocumentMixin, index: str) -> str:
+    """Return the cache key used to store the in_search_queryset result."""
+    return f"{instance.search_document_cache_key}:inqs:{index}"
+
+
 def _in_search_queryset(*, instance: Model, index: str) -> bool:
-    """Return True if instance is in the index queryset."""
+    """
+    Return True if instance is in the index queryset.
+
+    If the "in_search_queryset_cache_expiry" setting is set, the result is
+    cached for that many seconds, which saves a query on every save of the
+    same object. NB the cached value is not refreshed when the object is
+    saved, so only use this if saving an object rarely changes whether it
+    belongs in the search queryset.
+
+    """
     try:
-        return instance.__class__.objects.in_search_queryset(instance.pk, index=index)
+        if not (expiry := settings.get_setting("in_search_queryset_cache_expiry", 0)):
+            return instance.__class__.objects.in_search_queryset(
+                instance.pk, index=index
+            )
+        cache_key = _in_search_queryset_cache_key(instance, index)
+        if (in_qs := cache.get(cache_key)) is None:
+            in_qs = instance.__class__.objects.in_search_queryset(
+                instance.pk, index=index
+            )
+            cache.set(cache_key, in_qs, timeout=expiry)
+        return in_qs
     except Exception:  # noqa: B902
         logger.exception("Error checking object in_search_queryset.")
         return False
@@ -149,5 +174,7 @@ def _update_search_index(
 def _delete_from_search_index(*, instance: SearchDocumentMixin, index: str) -> None:
     """Remove a document from a search index."""
     pre_delete.send(sender=instance.__class__, instance=instance, index=index)
+    if settings.get_setting("in_search_queryset_cache_expiry", 0):
+        cache.delete(_in_search_queryset_cache_key(instance, index))
     if settings.auto_sync(instance):
         instance.delete_search_document(index=index)
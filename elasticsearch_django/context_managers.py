@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import time
 from datetime import timedelta
 from types import TracebackType
 
@@ -8,9 +9,14 @@ from django.utils.timezone import now as tz_now
 
 class stopwatch:
     def __enter__(self) -> stopwatch:
+        # started_at / stopped_at are wall-clock timestamps (for recording
+        # when something ran), the duration is measured using perf_counter
+        # which is monotonic and has a higher resolution.
         self.started_at = tz_now()
         self.stopped_at = None
         self.in_progress = True
+        self._start = time.perf_counter()
+        self._stop: float | None = None
         return self
 
     def __exit__(
@@ -19,15 +25,16 @@ class stopwatch:
         exc_value: Exception,
         traceback: TracebackType,
     ) -> None:
+        self._stop = time.perf_counter()
         self.stopped_at = tz_now()
         self.in_progress = False
 
     @property
     def duration(self) -> timedelta:
-        if self.in_progress:
-            return tz_now() - self.started_at
-        return self.stopped_at - self.started_at
+        return timedelta(seconds=self.elapsed)
 
     @property
     def elapsed(self) -> float:
-        return (self.duration).microseconds / 1e6
+        if self._stop is None:
+            return time.perf_counter() - self._start
+        return self._stop - self._start
@@ -1,11 +1,17 @@
 from __future__ import annotations
 
+import logging
 from contextlib import contextmanager
-from typing import Generator
+from typing import Generator, cast
 
 from django.db.models import signals
 
 from .apps import _on_model_save
+from .index import _bulk
+from .models import SearchActionBatch, _update_batch
+from .settings import get_client, get_setting
+
+logger = logging.getLogger(__name__)
 
 
 @contextmanager
@@ -38,3 +44,50 @@ def disable_search_updates() -> Generator:
     # add them back on again
     signals.post_save.receivers += search_update_receivers
     signals.post_save.sender_receivers_cache.clear()
+
+
+@contextmanager
+def batch_search_updates() -> Generator:
+    """
+    Context manager used to send search index updates in bulk requests.
+
+    Within the block, the index, update and delete requests made by
+    `index_search_document`, `update_search_document` and
+    `delete_search_document` (e.g. from the post_save / post_delete
+    signals) are collected rather than being sent to ES one request at a
+    time. They are sent using the bulk api whenever "bulk_batch_size"
+    (defaults to "chunk_size") actions have been collected, and when the
+    block exits.
+
+    >>> with batch_search_updates():
+    ...     for obj in model.objects.all():
+    ...         obj.save(update_fields=["timestamp"])
+
+    Nested blocks are sent when the outermost block exits. Updates are
+    collected per thread.
+
+    Actions that fail (e.g. deleting a document that is not in the index)
+    are logged, and do not raise an exception - this matches the behaviour
+    of the signal handlers outside of the block.
+
+    """
+    if getattr(_update_batch, "batch", None) is not None:
+        yield
+        return
+    batch = SearchActionBatch(
+        send=_send_batch,
+        size=cast(int, get_setting("bulk_batch_size", get_setting("chunk_size"))),
+    )
+    _update_batch.batch = batch
+    try:
+        yield
+    finally:
+        del _update_batch.batch
+        batch.flush()
+
+
+def _send_batch(actions: list[dict]) -> None:
+    """Send a batch of actions using the bulk api, logging any failures."""
+    _, errors = _bulk(get_client(), actions, raise_on_error=False)
+    if errors:
+        logger.error("Error sending batched search updates: %s", errors)
@@ -0,0 +1,66 @@
+"""JSON encoding used by the SearchQuery JSON fields and the document cache."""
+from __future__ import annotations
+
+import json
+from typing import Any
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+try:
+    import orjson
+
+    HAS_ORJSON = True
+    # datetimes are passed through to DjangoJSONEncoder.default so that they
+    # are formatted exactly as they always have been.
+    ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+except ImportError:  # pragma: no cover
+    HAS_ORJSON = False
+
+
+class SearchJSONEncoder(DjangoJSONEncoder):
+    """
+    DjangoJSONEncoder that uses orjson (if installed) to encode values.
+
+    orjson is considerably faster than the stdlib json module when encoding
+    large documents - e.g. the hits and aggregations returned from a search.
+    Any value that orjson cannot serialize natively is passed to the
+    DjangoJSONEncoder.default method, and if orjson is not installed (or the
+    encoder is configured with options that orjson does not support) this
+    behaves exactly like DjangoJSONEncoder.
+
+    NB when orjson is used NaN / Infinity are encoded as null rather than as
+    (invalid JSON) NaN / Infinity, and dataclasses and enums are serialized
+    natively rather than raising TypeError.
+
+    """
+
+    def encode(self, o: Any) -> str:
+        if not HAS_ORJSON or self.indent is not None or self.sort_keys:
+            return super().encode(o)
+        try:
+            return orjson.dumps(o, default=self.default, option=ORJSON_OPTIONS).decode()
+        except orjson.JSONEncodeError:
+            # e.g. integers > 64-bit - let the stdlib handle (or reject) it
+            return super().encode(o)
+
+
+def dumps_sorted(value: Any) -> bytes:
+    """
+    Return value encoded as JSON with sorted keys.
+
+    Used to compare documents (the output is stable regardless of the order
+    in which keys were added). Uses orjson if it is installed.
+
+    """
+    if HAS_ORJSON:
+        try:
+            return orjson.dumps(
+                value,
+                default=SearchJSONEncoder().default,
+                option=ORJSON_OPTIONS | orjson.OPT_SORT_KEYS,
+            )
+        except orjson.JSONEncodeError:
+            pass
+    return json.dumps(
+        value, cls=DjangoJSONEncoder, sort_keys=True, separators=(",", ":")
+    ).encode()
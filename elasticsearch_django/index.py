@@ -1,13 +1,22 @@
 from __future__ import annotations
 
 import logging
-from typing import Any, Generator, List, Sequence, Tuple, Union
+from typing import Any, Generator, Iterable, List, Tuple, Union, cast
 
-from django.db.models import Model
+from django.core.cache import cache
+from django.db.models import Model, QuerySet
 from elastic_transport import ObjectApiResponse
-from elasticsearch import helpers
-
-from .models import SearchDocumentMixin
+from elasticsearch import Elasticsearch, helpers
+
+from .models import (
+    CACHE_EXPIRY,
+    SearchDocumentMixin,
+    _document_cache_keys,
+    _document_digest,
+    _indexed_document_cache_values,
+    _iter_queryset,
+    _use_document_cache,
+)
 from .settings import get_client, get_index_mapping, get_index_models, get_setting
 
 BulkResponseType = Tuple[int, Union[int, List[Any]]]
@@ -34,13 +43,123 @@ def update_index(index: str) -> list[BulkResponseType]:
     responses: list[BulkResponseType] = []
     for model in get_index_models(index):
         logger.info("Updating search index model: '%s'", model._meta.label)
-        objects = model.objects.get_search_queryset(index).iterator()
+        objects = model.objects.iter_search_queryset(index)
         actions = bulk_actions(objects, index=index, action="index")
-        response = helpers.bulk(client, actions, chunk_size=get_setting("chunk_size"))
-        responses.append(response)
+        responses.append(_bulk(client, actions))
     return responses
 
 
+def index_documents(
+    objects: Iterable[SearchDocumentMixin], index: str
+) -> BulkResponseType:
+    """
+    Index a collection of objects, skipping those whose document is unchanged.
+
+    This is the bulk equivalent of calling `index_search_document` on each
+    object. The document cache is read in a single round trip, the changed
+    documents are sent using the bulk api, and the cache is then updated in
+    a single round trip.
+
+    Returns the (success count, errors) tuple from the bulk api.
+
+    """
+    use_cache = _use_document_cache()
+    objects = list(objects)
+    cache_keys = [
+        _document_cache_keys(obj.search_document_cache_key, index) for obj in objects
+    ]
+    cached = cache.get_many([keys[0] for keys in cache_keys]) if use_cache else {}
+    actions: list[dict] = []
+    cache_values: dict[str, str | None] = {}
+    for obj, keys in zip(objects, cache_keys):
+        document = obj.as_search_document(index=index)
+        if use_cache:
+            digest = _document_digest(document)
+            if cached.get(keys[0]) == digest:
+                logger.debug("Search document for %r is unchanged.", obj)
+                continue
+            cache_values.update(_indexed_document_cache_values(keys, digest))
+        actions.append(
+            {
+                "_index": index,
+                "_op_type": "index",
+                "_id": obj.get_search_document_id(),
+                "_source": document,
+            }
+        )
+    if not actions:
+        return 0, []
+    response = _bulk(get_client(), actions)
+    if cache_values:
+        cache.set_many(cache_values, timeout=CACHE_EXPIRY)
+    return response
+
+
+def delete_documents(
+    objects: Iterable[SearchDocumentMixin], index: str
+) -> BulkResponseType:
+    """
+    Delete a collection of objects from the index.
+
+    This is the bulk equivalent of calling `delete_search_document` on each
+    object. The cached documents are removed in a single round trip, and
+    the deletes are sent using the bulk api.
+
+    Returns the (success count, errors) tuple from the bulk api.
+
+    """
+    objects = list(objects)
+    if not objects:
+        return 0, []
+    if _use_document_cache():
+        cache.delete_many(
+            [
+                key
+                for obj in objects
+                for key in _document_cache_keys(obj.search_document_cache_key, index)
+            ]
+        )
+    actions = [
+        {"_index": index, "_op_type": "delete", "_id": obj.get_search_document_id()}
+        for obj in objects
+    ]
+    return _bulk(get_client(), actions)
+
+
+def _bulk(
+    client: Elasticsearch, actions: Iterable[dict], raise_on_error: bool = True
+) -> BulkResponseType:
+    """
+    Send actions to the bulk api, returning (success count, errors).
+
+    If the "parallel_bulk" setting is True then the actions are sent in
+    chunks across multiple threads ("parallel_bulk_thread_count", default 4)
+    using the `parallel_bulk` helper, else they are sent sequentially.
+
+    If raise_on_error is True (the default) a BulkIndexError is raised if
+    any action fails, else the failed actions are returned as the errors.
+
+    """
+    chunk_size = cast(int, get_setting("chunk_size"))
+    if not get_setting("parallel_bulk", False):
+        return helpers.bulk(
+            client, actions, chunk_size=chunk_size, raise_on_error=raise_on_error
+        )
+    success, errors = 0, []
+    for ok, item in helpers.parallel_bulk(
+        client,
+        actions,
+        chunk_size=chunk_size,
+        thread_count=cast(int, get_setting("parallel_bulk_thread_count", 4)),
+        raise_on_error=raise_on_error,
+    ):
+        if ok:
+            success += 1
+        else:
+            errors.append(item)
+    return success, errors
+
+
 def delete_index(index: str, ignore_unavailable: bool = True) -> ObjectApiResponse:
     """Delete index entirely (removes all documents and mapping)."""
     logger.info("Deleting search index: '%s'", index)
@@ -83,10 +202,7 @@ def prune_index(index: str) -> list[BulkResponseType]:
         )
         if len(prunes) > 0:
             actions = bulk_actions(prunes, index, "delete")
-            response = helpers.bulk(
-                client, actions, chunk_size=get_setting("chunk_size")
-            )
-            responses.append(response)
+            responses.append(_bulk(client, actions))
     return responses
 
 
@@ -156,7 +272,7 @@ def scan_index(index: str, model: Model) -> Generator:
     yield from helpers.scan(client, index=index)
 
 
-def bulk_actions(objects: Sequence[Model], index: str, action: str) -> Generator:
+def bulk_actions(objects: Iterable[Model], index: str, action: str) -> Generator:
     """
     Yield bulk api 'actions' from a collection of objects.
 
@@ -166,8 +282,11 @@ def bulk_actions(objects: Sequence[Model], index: str, action: str) -> Generator
 
     Args:
         objects: iterable (queryset, list, ...) of SearchDocumentMixin
-            objects. If the objects passed in is a generator, then this
-                function will yield the results rather than returning them.
+            objects. If a queryset is passed in it is streamed from the
+            database in chunks (using `QuerySet.iterator`) rather than
+            being loaded into memory in its entirety - unless it uses
+            `prefetch_related` and Django < 4.1, in which case it is
+            evaluated normally so that the prefetch is not lost.
         index: string, the name of the index to target - the index name
             is embedded into the return value and is used by the bulk api.
         action: string ['index' | 'update' | 'delete'] - this decides
@@ -179,6 +298,8 @@ def bulk_actions(objects: Sequence[Model], index: str, action: str) -> Generator
             "index arg must be a valid index name. '_all' is a reserved term."
         )
     logger.info("Creating bulk '%s' actions for '%s'", action, index)
+    if isinstance(objects, QuerySet):
+        objects = _iter_queryset(objects, cast(int, get_setting("chunk_size")))
     for obj in objects:
         try:
             logger.debug("Appending '%s' action for '%r'", action, obj)
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.30 on 2026-10-16 04:16
+
+from django.db import migrations, models
+
+import elasticsearch_django.encoders
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("elasticsearch_django", "0012_alter_searchquery_aggregations_and_more"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="searchquery",
+            name="aggregations",
+            field=models.JSONField(
+                blank=True,
+                default=None,
+                encoder=elasticsearch_django.encoders.SearchJSONEncoder,
+                help_text="The raw aggregations returned from the query.",
+                null=True,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="searchquery",
+            name="hits",
+            field=models.JSONField(
+                blank=True,
+                encoder=elasticsearch_django.encoders.SearchJSONEncoder,
+                help_text="The list of meta info for each of the query matches returned.",
+                null=True,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="searchquery",
+            name="query",
+            field=models.JSONField(
+                encoder=elasticsearch_django.encoders.SearchJSONEncoder,
+                help_text="The raw Elasticsearch DSL query.",
+            ),
+        ),
+    ]
@@ -1,21 +1,28 @@
 from __future__ import annotations
 
-import copy
+import dataclasses
+import functools
+import hashlib
 import logging
-from typing import Any, cast
+import operator
+import threading
+from typing import Any, Callable, Iterable, Iterator, cast
 
+import django
 from django.conf import settings
 from django.core.cache import cache
-from django.core.serializers.json import DjangoJSONEncoder
+from django.core.signals import setting_changed
 from django.db import models
-from django.db.models import Case, Value, When
+from django.db.models import Case, FloatField, Value, When
 from django.db.models.query import QuerySet
+from django.dispatch import receiver
 from django.utils.functional import SimpleLazyObject
 from django.utils.translation import gettext_lazy as _lazy
 from elastic_transport import ObjectApiResponse
-from elasticsearch import Elasticsearch
+from elasticsearch import ApiError, Elasticsearch
 
 from .context_managers import stopwatch
+from .encoders import SearchJSONEncoder, dumps_sorted
 from .settings import (
     get_client,
     get_model_index_properties,
@@ -33,6 +40,191 @@ DEFAULT_CLIENT: Elasticsearch = SimpleLazyObject(get_client)
 DEFAULT_FROM: int = 0
 DEFAULT_PAGE_SIZE = cast(int, get_setting("page_size"))
 DEFAULT_INCLUDE_SOURCE = bool(get_setting("include_source", True))
+# set to False to drop the raw search response once it has been parsed
+RETAIN_QUERY_RESPONSE = bool(get_setting("retain_query_response", True))
+
+# search params that go in the msearch header line (not the search body)
+MSEARCH_HEADER_PARAMS = frozenset(
+    [
+        "allow_no_indices",
+        "allow_partial_search_results",
+        "ccs_minimize_roundtrips",
+        "expand_wildcards",
+        "ignore_throttled",
+        "ignore_unavailable",
+        "preference",
+        "request_cache",
+        "routing",
+        "search_type",
+    ]
+)
+
+# resolved once on import as they are read for every document indexed
+CACHE_EXPIRY = cast("int | None", get_setting("cache_expiry", 60))
+RETRY_ON_CONFLICT = cast(int, get_setting("retry_on_conflict", 0))
+
+# QuerySet.iterator ignores prefetch_related before Django 4.1
+ITERATOR_SUPPORTS_PREFETCH = django.VERSION >= (4, 1)
+
+# search actions are collected here (per thread) within batch_search_updates
+_update_batch = threading.local()
+
+
+class SearchActionBatch:
+    """
+    Collection of bulk api actions to be sent to ES in batches.
+
+    Created by the `decorators.batch_search_updates` context manager - the
+    `send` function is called with the actions whenever `size` actions
+    have been added, and on `flush`.
+
+    """
+
+    def __init__(self, send: Callable[[list[dict]], Any], size: int) -> None:
+        self.send = send
+        self.size = size
+        self.actions: list[dict] = []
+
+    def add(self, action: dict) -> None:
+        self.actions.append(action)
+        if len(self.actions) >= self.size:
+            self.flush()
+
+    def flush(self) -> None:
+        actions, self.actions = self.actions, []
+        if actions:
+            self.send(actions)
+
+
+def _add_to_batch(action: dict) -> bool:
+    """Add action to the current thread's batch, returning False if there isn't one."""
+    if (batch := getattr(_update_batch, "batch", None)) is None:
+        return False
+    batch.add(action)
+    return True
+
+
+def _iter_queryset(queryset: QuerySet, chunk_size: int) -> Iterator[Any]:
+    """
+    Iterate over a queryset, fetching objects from the database in chunks.
+
+    Before Django 4.1 `QuerySet.iterator` ignores `prefetch_related`, so a
+    queryset with prefetch lookups is evaluated normally on older versions.
+
+    """
+    if queryset._prefetch_related_lookups and not ITERATOR_SUPPORTS_PREFETCH:
+        return iter(queryset)
+    return queryset.iterator(chunk_size)
+
+
+def _use_document_cache() -> bool:
+    """Return False if the document cache is disabled (cache_expiry <= 0)."""
+    # NB a cache_expiry of None is valid - documents are cached forever
+    return CACHE_EXPIRY is None or CACHE_EXPIRY > 0
+
+
+@functools.lru_cache(maxsize=None)
+def _search_indexes(model: type[models.Model]) -> tuple[str, ...]:
+    """Return the names of the indexes in which a model is configured (memoized)."""
+    return tuple(get_model_indexes(model))
+
+
+@functools.lru_cache(maxsize=None)
+def _cache_key_prefix(model: type[models.Model]) -> str:
+    """Return the prefix used for a model's search document cache keys (memoized)."""
+    return f"elasticsearch_django:{model._meta.app_label}.{model._meta.model_name}."
+
+
+@functools.lru_cache(maxsize=None)
+def _search_fields(model: type[models.Model], index: str) -> frozenset[str]:
+    """Return the set of properties in an index mapping for a model (memoized)."""
+    return frozenset(get_model_index_properties(model, index))
+
+
+@functools.lru_cache(maxsize=None)
+def _related_field_names(model: type[models.Model]) -> tuple[str, ...]:
+    """Return the names of a model's relation fields, in field order (memoized)."""
+    return tuple(f.name for f in model._meta.get_fields() if f.is_relation)
+
+
+# update_fields is caller-supplied, so this cache is bounded (unlike the
+# per-model caches above, which are bounded by the number of models)
+@functools.lru_cache(maxsize=1024)
+def _clean_update_fields(
+    model: type[models.Model], index: str, update_fields: tuple[str, ...]
+) -> tuple[tuple[str, ...], tuple[str, ...]]:
+    """
+    Split update_fields into those in the index mapping, and those ignored (memoized).
+
+    Raises ValueError if a field in the mapping is a relation (this is not
+    memoized, and so is raised on every call).
+
+    """
+    # mypy does not consider type[Model] to be Hashable
+    search_fields = _search_fields(model, index)  # type: ignore[arg-type]
+    related_fields = _related_field_names(model)  # type: ignore[arg-type]
+    clean_fields: list[str] = []
+    ignore: list[str] = []
+    for f in update_fields:
+        if f not in search_fields:
+            ignore.append(f)
+        elif f in related_fields:
+            raise ValueError(
+                "'%s' cannot be automatically serialized into a search "
+                "document property. Please override as_search_document_update.",
+                f,
+            )
+        else:
+            clean_fields.append(f)
+    return tuple(clean_fields), tuple(ignore)
+
+
+@functools.lru_cache(maxsize=None)
+def _document_field_getters(
+    fields: tuple[str, ...],
+) -> tuple[tuple[str, Callable[[Any], Any]], ...]:
+    """Return (field, attrgetter) pairs for search_document_fields (memoized)."""
+    return tuple((f, operator.attrgetter(f)) for f in fields)
+
+
+@receiver(setting_changed)
+def _clear_memoized_settings(*, setting: str, **kwargs: Any) -> None:
+    """Clear the memoized index config if SEARCH_SETTINGS is overridden."""
+    if setting == "SEARCH_SETTINGS":
+        _search_indexes.cache_clear()
+        _search_fields.cache_clear()
+        _clean_update_fields.cache_clear()
+
+
+def _document_digest(document: dict) -> str:
+    """Return a short digest of a search document, used to detect changes."""
+    return hashlib.blake2b(dumps_sorted(document), digest_size=16).hexdigest()
+
+
+def _document_cache_keys(cache_key: str, index: str) -> tuple[str, str, str]:
+    """
+    Return the (digest, version, partial update digest) cache keys.
+
+    A model may appear in more than one index (with a different document in
+    each), so all of the keys are per index.
+
+    """
+    key = f"{cache_key}:{index}"
+    return key, f"{key}:ver", f"{key}:partial"
+
+
+def _indexed_document_cache_values(
+    cache_keys: tuple[str, str, str], digest: str, version: str | None = None
+) -> dict[str, str | None]:
+    """
+    Return the values to cache once a full document has been indexed.
+
+    The partial update digest is cleared, as the last partial update no
+    longer reflects the indexed document.
+
+    """
+    digest_key, version_key, partial_key = cache_keys
+    return {digest_key: digest, version_key: version, partial_key: None}
 
 
 class SearchResultsQuerySet(QuerySet):
@@ -85,6 +277,10 @@ class SearchResultsQuerySet(QuerySet):
 
     # the field used to map objects to search document id
     search_document_id_field = "pk"
+    # relations to fetch along with the search results (avoids N+1 queries
+    # when the results are rendered)
+    search_result_select_related: tuple[str, ...] = ()
+    search_result_prefetch_related: tuple[str, ...] = ()
 
     def filter_search_results(self, search_query: SearchQuery) -> SearchResultsQuerySet:
         """Filter queryset on PK field to match search query hits."""
@@ -112,24 +308,77 @@ class SearchResultsQuerySet(QuerySet):
         self, search_query: SearchQuery
     ) -> SearchResultsQuerySet:
         """Add search_rank and search_score annotations to queryset."""
-        return self.add_search_rank(search_query).add_search_score(search_query)
+        if annotations := search_query.search_annotations(
+            self.search_document_id_field
+        ):
+            search_rank, search_score = annotations
+            return self.annotate(search_rank=search_rank, search_score=search_score)
+        return self.annotate(search_rank=Value(1), search_score=Value(1.0))
 
-    def add_search_highlights(self, search_query: SearchQuery) -> list:
-        """Add search_highlights attr. to each object in the queryset (evaluates QS)."""
-        obj_list = list(self)
+    def add_search_highlights(
+        self, search_query: SearchQuery
+    ) -> SearchResultsQuerySet | list:
+        """
+        Add search_highlights attr. to each object in the queryset (evaluates QS).
+
+        If the search query has no highlights then there is nothing to add, and
+        the queryset is returned unevaluated.
+
+        """
         if not search_query.has_highlights:
-            return obj_list
+            return self
 
+        obj_list = list(self)
+        get_id = operator.attrgetter(self.search_document_id_field)
+        hits_by_id = search_query._hits_by_id
         for obj in obj_list:
-            pk = getattr(obj, self.search_document_id_field)
-            obj.search_highlights = search_query.get_doc_highlights(pk)
+            _, hit = hits_by_id[str(get_id(obj))]
+            obj.search_highlights = hit.get("highlight")
         return obj_list
 
+    def with_search_result_relations(self) -> SearchResultsQuerySet:
+        """Apply the search_result_select/prefetch_related relations to queryset."""
+        qs = self
+        if self.search_result_select_related:
+            qs = qs.select_related(*self.search_result_select_related)
+        if self.search_result_prefetch_related:
+            qs = qs.prefetch_related(*self.search_result_prefetch_related)
+        return qs
+
     def from_search_results(self, search_query: SearchQuery) -> SearchResultsQuerySet:
-        qs = self.filter_search_results(search_query)
+        qs = self.filter_search_results(search_query).with_search_result_relations()
         qs = qs.add_search_annotations(search_query)
         return qs.order_by("search_rank")
 
+    def ordered_from_search_results(self, search_query: SearchQuery) -> list:
+        """
+        Return objects matching search query hits, in rank order (evaluates QS).
+
+        This is an alternative to `from_search_results` for large pages of
+        results. It does not use the CASE / WHEN annotations (which contain
+        one clause per hit) - the objects are fetched using a single `IN`
+        query and then ordered in Python. The `search_rank` and `search_score`
+        attrs are set on each object, as is `search_highlights` if the search
+        query includes highlights.
+
+        NB this returns a list, not a QuerySet.
+
+        """
+        qs = self.filter_search_results(search_query).with_search_result_relations()
+        get_id = operator.attrgetter(self.search_document_id_field)
+        objects = {str(get_id(obj)): obj for obj in qs}
+        has_highlights = bool(search_query.query) and search_query.has_highlights
+        obj_list = []
+        for rank, hit in enumerate(search_query.hits or [], start=1):
+            if (obj := objects.get(str(hit["id"]))) is None:
+                continue
+            obj.search_rank = rank
+            obj.search_score = None if hit["score"] is None else float(hit["score"])
+            if has_highlights:
+                obj.search_highlights = hit.get("highlight")
+            obj_list.append(obj)
+        return obj_list
+
 
 class SearchDocumentManagerMixin(models.Manager):
     """
@@ -140,6 +389,13 @@ class SearchDocumentManagerMixin(models.Manager):
     of objects to be indexed. This queryset is then converted into a
     generator that emits the objects as JSON documents.
 
+    The objects are streamed from the database in chunks (see
+    `iter_search_queryset`), so if `as_search_document` uses related
+    objects then `get_search_queryset` should include the appropriate
+    `select_related` calls. `prefetch_related` lookups are run once per
+    chunk rather than once per object on Django 4.1+ - before 4.1
+    `QuerySet.iterator` ignores `prefetch_related` entirely.
+
     If you are using a different database connection for the
     `get_search_queryset` method from the one that you use to save
     models you may run into a situation where the `in_search_queryset`
@@ -176,6 +432,28 @@ class SearchDocumentManagerMixin(models.Manager):
             )
         )
 
+    def iter_search_queryset(
+        self, index: str = "_all", chunk_size: int | None = None
+    ) -> Iterator[Any]:
+        """
+        Iterate over the search queryset, fetching objects in chunks.
+
+        Objects are streamed from the database using `QuerySet.iterator`,
+        so memory use is bounded by the chunk size rather than the size
+        of the queryset. This is what should be used when indexing. (On
+        Django < 4.1 a queryset that uses `prefetch_related` is evaluated
+        normally, as `QuerySet.iterator` would ignore the prefetch.)
+
+        Kwargs:
+            index: string, the name of the index - passed to
+                `get_search_queryset`. Defaults to '_all'.
+            chunk_size: int, number of objects fetched from the database
+                at a time. Defaults to the "chunk_size" setting.
+
+        """
+        chunk_size = chunk_size or cast(int, get_setting("chunk_size"))
+        return _iter_queryset(self.get_search_queryset(index=index), chunk_size)
+
     def in_search_queryset(self, instance_pk: Any, index: str = "_all") -> bool:
         """
         Return True if an object is part of the search index queryset.
@@ -202,6 +480,28 @@ class SearchDocumentManagerMixin(models.Manager):
             qs = qs.using(alias)
         return qs.exists()
 
+    def in_search_queryset_many(
+        self, instance_pks: Iterable[Any], index: str = "_all"
+    ) -> set[Any]:
+        """
+        Return the set of primary keys that are part of the search index queryset.
+
+        This is the bulk equivalent of `in_search_queryset` - it runs a single
+        query for all of the objects rather than one query per object.
+
+        Args:
+            instance_pks: the primary keys of the model objects to check.
+
+        Kwargs:
+            index: string, the name of the index in which to check.
+                Defaults to '_all'.
+
+        """
+        qs = self.get_search_queryset(index=index).filter(pk__in=instance_pks)
+        if alias := self.IN_SEARCH_QUERYSET_DB_ALIAS:
+            qs = qs.using(alias)
+        return set(qs.values_list("pk", flat=True))
+
 
 class SearchDocumentMixin:
     """
@@ -211,8 +511,15 @@ class SearchDocumentMixin:
     are indexed ready for ES. The only method that needs
     implementing is `as_search_document`.
 
+    Models whose search document is a flat copy of some of their
+    attributes can set `search_document_fields` instead.
+
     """
 
+    # if set, the default as_search_document returns {field: value} for
+    # each of these attributes (dotted paths are supported).
+    search_document_fields: tuple[str, ...] = ()
+
     @property
     def _model_meta(self) -> Any:
         if not (meta := getattr(self, "_meta")):
@@ -225,16 +532,13 @@ class SearchDocumentMixin:
     @property
     def search_indexes(self) -> list[str]:
         """Return the list of indexes for which this model is configured."""
-        return get_model_indexes(self.__class__)
+        return list(_search_indexes(self._model_meta.model))
 
     @property
     def search_document_cache_key(self) -> str:
         """Key used for storing search docs in local cache."""
-        return "elasticsearch_django:{}.{}.{}".format(
-            self._model_meta.app_label,
-            self._model_meta.model_name,
-            self.get_search_document_id(),
-        )
+        prefix = _cache_key_prefix(self._model_meta.model)
+        return f"{prefix}{self.get_search_document_id()}"
 
     def as_search_document(self, *, index: str) -> dict:
         """
@@ -251,15 +555,37 @@ class SearchDocumentMixin:
                 indexes. Defaults to '_all', in which case all indexes use
                 the same search document structure.
 
-        Returns a dictionary.
+        Returns a dictionary. The default implementation returns the values
+        of the attributes named in `search_document_fields` - if this is
+        not set then this method must be overridden.
 
         """
+        if fields := self.search_document_fields:
+            # fields may be declared as a list, which is not hashable
+            getters = _document_field_getters(tuple(fields))
+            return {f: getter(self) for f, getter in getters}
         raise NotImplementedError(
             "{} does not implement 'as_search_document'.".format(
                 self.__class__.__name__
             )
         )
 
+    def search_document_version(self) -> str | None:
+        """
+        Return a cheap version stamp for the search document, or None.
+
+        If this returns a value (e.g. a `last_modified` timestamp, or a row
+        version counter) then `index_search_document` will compare it with the
+        version last indexed, and if they match it will skip building the
+        document altogether. This is useful when `as_search_document` is
+        expensive (e.g. it walks model relations).
+
+        The default implementation returns None, in which case the document
+        is always built and compared with the cached copy.
+
+        """
+        return None
+
     def get_search_document_id(self) -> str:
         """
         Return the value to be used as the search document id.
@@ -276,7 +602,7 @@ class SearchDocumentMixin:
     @property
     def _related_fields(self) -> list[str]:
         """Return the list of fields that are relations and not serializable."""
-        return [f.name for f in self._model_meta.get_fields() if f.is_relation]
+        return list(_related_field_names(self._model_meta.model))
 
     def clean_update_fields(self, index: str, update_fields: list[str]) -> list[str]:
         """
@@ -289,20 +615,12 @@ class SearchDocumentMixin:
         method will raise a ValueError.
 
         """
-        search_fields = get_model_index_properties(self, index)
-        clean_fields = [f for f in update_fields if f in search_fields]
-        ignore = [f for f in update_fields if f not in search_fields]
-        if ignore:
-            logger.debug("Ignoring fields from partial update: %s", ignore)
-
-        for f in clean_fields:
-            if f in self._related_fields:
-                raise ValueError(
-                    "'%s' cannot be automatically serialized into a search "
-                    "document property. Please override as_search_document_update.",
-                    f,
-                )
-        return clean_fields
+        clean_fields, ignore = _clean_update_fields(
+            self._model_meta.model, index, tuple(update_fields)
+        )
+        if ignore and logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Ignoring fields from partial update: %s", list(ignore))
+        return list(clean_fields)
 
     def as_search_document_update(
         self, *, index: str, update_fields: list[str]
@@ -350,12 +668,14 @@ class SearchDocumentMixin:
         if UPDATE_STRATEGY == UPDATE_STRATEGY_PARTIAL:
             # in partial mode we update the intersection of update_fields and
             # properties found in the mapping file.
-            return {
-                k: getattr(self, k)
-                for k in self.clean_update_fields(
-                    index=index, update_fields=update_fields
-                )
-            }
+            if not update_fields:
+                return {}
+            fields = self.clean_update_fields(index=index, update_fields=update_fields)
+            if not fields:
+                return {}
+            # attrgetter returns a single value (not a tuple) for a single field
+            values = operator.attrgetter(*fields)(self)
+            return dict(zip(fields, values if len(fields) > 1 else (values,)))
 
         raise ValueError("Invalid update strategy.")
 
@@ -406,22 +726,59 @@ class SearchDocumentMixin:
 
         Checks the local cache to see if the document has changed,
         and if not aborts the update, else pushes to ES, and then
-        resets the local cache. Cache timeout is set as "cache_expiry"
-        in the settings, and defaults to 60s.
+        resets the local cache. Only a digest of the document is
+        cached (per index), not the document itself. Cache timeout is set as
+        "cache_expiry" in the settings, and defaults to 60s.
+
+        If the object supplies a `search_document_version` then this is
+        checked first, and if it is unchanged the document is not built.
+
+        If "cache_expiry" is 0 then the cache is not used at all, and
+        the document is always pushed to ES.
+
+        If called within a `batch_search_updates` block the document is not
+        sent immediately, but is sent with the rest of the batch.
 
         """
-        cache_key = self.search_document_cache_key
+        if not _use_document_cache():
+            self._index_document(index, self.as_search_document(index=index))
+            return
+        cache_keys = _document_cache_keys(self.search_document_cache_key, index)
+        digest_key, version_key, _ = cache_keys
+        version = self.search_document_version()
+        # fetch (and later set) the digest and version in a single round trip
+        cached = cache.get_many(
+            [digest_key] if version is None else [digest_key, version_key]
+        )
+        if version is not None and cached.get(version_key) == version:
+            logger.debug("Search document for %r is unchanged (version).", self)
+            return
         new_doc = self.as_search_document(index=index)
-        cached_doc = cache.get(cache_key)
-        if new_doc == cached_doc:
+        digest = _document_digest(new_doc)
+        if cached.get(digest_key) == digest:
             logger.debug("Search document for %r is unchanged, ignoring update.", self)
+            if version is not None:
+                # the document has not changed, but the version has
+                cache.set(version_key, version, timeout=CACHE_EXPIRY)
             return
-        cache.set(cache_key, new_doc, timeout=get_setting("cache_expiry", 60))
-        _ = get_client().index(
-            index=index,
-            document=new_doc,
-            id=self.get_search_document_id(),
+        cache.set_many(
+            _indexed_document_cache_values(cache_keys, digest, version),
+            timeout=CACHE_EXPIRY,
         )
+        self._index_document(index, new_doc)
+
+    def _index_document(self, index: str, document: dict) -> None:
+        """Send document to ES (or add to the current batch)."""
+        if _add_to_batch(
+            {
+                "_index": index,
+                "_op_type": "index",
+                "_id": (doc_id := self.get_search_document_id()),
+                "_source": document,
+            }
+        ):
+            return
+        _ = get_client().index(index=index, document=document, id=doc_id)
 
     def update_search_document(self, *, index: str, update_fields: list[str]) -> None:
         """
@@ -442,23 +799,74 @@ class SearchDocumentMixin:
         must be passed to the `client.update` wrapped in a "doc" node,
         # noqa: E501, see: https://www.elastic.co/guide/en/elasticsearch/reference/current/docs-update.html
 
+        The last partial update document sent is cached (as a digest), and if
+        the same update is made again it is ignored. The digest is only cached
+        once the update has been sent successfully, and is not cached for
+        updates sent within a `batch_search_updates` block.
+
+        If called within a `batch_search_updates` block the update is not
+        sent immediately, but is sent with the rest of the batch.
+
         """
+        if not update_fields:
+            logger.debug("Ignoring object update as there are no update_fields.")
+            return
         doc = self.as_search_document_update(index=index, update_fields=update_fields)
         if not doc:
             logger.debug("Ignoring object update as document is empty.")
             return
-        retry_on_conflict = cast(int, get_setting("retry_on_conflict", 0))
+        digest = None
+        if _use_document_cache():
+            cache_keys = _document_cache_keys(self.search_document_cache_key, index)
+            partial_key = cache_keys[2]
+            digest = _document_digest(doc)
+            if cache.get(partial_key) == digest:
+                logger.debug("Ignoring object update as document is unchanged.")
+                return
+            # the cached full document (and version) no longer match the
+            # document in the index, and the partial digest is only set
+            # once the update has been sent successfully.
+            cache.delete_many(cache_keys)
+        if _add_to_batch(
+            {
+                "_index": index,
+                "_op_type": "update",
+                "_id": (doc_id := self.get_search_document_id()),
+                "doc": doc,
+                "retry_on_conflict": RETRY_ON_CONFLICT,
+            }
+        ):
+            return
         _ = get_client().update(
             index=index,
-            id=self.get_search_document_id(),
+            id=doc_id,
             doc=doc,
-            retry_on_conflict=retry_on_conflict,
+            retry_on_conflict=RETRY_ON_CONFLICT,
         )
+        if digest is not None:
+            cache.set(partial_key, digest, timeout=CACHE_EXPIRY)
 
     def delete_search_document(self, *, index: str) -> None:
-        """Delete document from named index."""
-        cache.delete(self.search_document_cache_key)
-        _ = get_client().delete(index=index, id=self.get_search_document_id())
+        """
+        Delete document from named index.
+
+        If called within a `batch_search_updates` block the delete is not
+        sent immediately, but is sent with the rest of the batch.
+
+        """
+        if _use_document_cache():
+            cache.delete_many(
+                _document_cache_keys(self.search_document_cache_key, index)
+            )
+        if _add_to_batch(
+            {
+                "_index": index,
+                "_op_type": "delete",
+                "_id": (doc_id := self.get_search_document_id()),
+            }
+        ):
+            return
+        _ = get_client().delete(index=index, id=doc_id)
 
 
 class SearchQuery(models.Model):
@@ -510,7 +918,7 @@ class SearchQuery(models.Model):
         ),
     )
     query = models.JSONField(
-        help_text=_lazy("The raw Elasticsearch DSL query."), encoder=DjangoJSONEncoder
+        help_text=_lazy("The raw Elasticsearch DSL query."), encoder=SearchJSONEncoder
     )
     query_type = models.CharField(
         help_text=_lazy("Does this query return results, or just the hit count?"),
@@ -524,7 +932,7 @@ class SearchQuery(models.Model):
         ),
         blank=True,
         null=True,
-        encoder=DjangoJSONEncoder,
+        encoder=SearchJSONEncoder,
     )
     total_hits = models.IntegerField(
         default=0,
@@ -543,7 +951,7 @@ class SearchQuery(models.Model):
     )
     aggregations = models.JSONField(
         help_text=_lazy("The raw aggregations returned from the query."),
-        encoder=DjangoJSONEncoder,
+        encoder=SearchJSONEncoder,
         default=None,
         blank=True,
         null=True,
@@ -579,6 +987,8 @@ class SearchQuery(models.Model):
 
     def __init__(self, *args: Any, **kwargs: Any) -> None:
         self.query_response = kwargs.pop("query_response", None)
+        # values derived from hits - see _cached_from_hits
+        self._hits_cache: tuple[list | None, dict[str, Any]] | None = None
         super().__init__(*args, **kwargs)
 
     def save(self, *args: Any, **kwargs: Any) -> SearchQuery:
@@ -591,28 +1001,67 @@ class SearchQuery(models.Model):
         super().save(*args, **kwargs)
         return self
 
+    def _cached_from_hits(self, key: str, func: Callable[[list[dict]], Any]) -> Any:
+        """
+        Return a value derived from the hits, computed once and then cached.
+
+        This is used to extract per-property lists ("columns") from the hits
+        on first access, so that repeated access to ids / scores does not
+        walk the list of hit dicts each time.
+
+        Cached values are discarded if the hits attribute is replaced (hits
+        are not expected to be mutated in place).
+
+        """
+        if self._hits_cache is None or self._hits_cache[0] is not self.hits:
+            self._hits_cache = (self.hits, {})
+        values = self._hits_cache[1]
+        if key not in values:
+            values[key] = func(self.hits or [])
+        return values[key]
+
+    @property
+    def _hits_by_id(self) -> dict[str, tuple[int, dict]]:
+        """Return a {doc_id: (rank, hit)} lookup for the hits (0-based rank)."""
+
+        def _lookup(hits: list[dict]) -> dict[str, tuple[int, dict]]:
+            lookup: dict[str, tuple[int, dict]] = {}
+            for rank, hit in enumerate(hits):
+                # the first hit wins if a document appears more than once
+                lookup.setdefault(str(hit["id"]), (rank, hit))
+            return lookup
+
+        return self._cached_from_hits("hits_by_id", _lookup)
+
     def _hit_values(self, property_name: str) -> list[str | float]:
         """Extract list of property values from each hit in search results."""
-        return [] if self.hits is None else [h[property_name] for h in self.hits]
+        return self._cached_from_hits(
+            f"values.{property_name}", lambda hits: [h[property_name] for h in hits]
+        )
+
+    @property
+    def _hit_scores(self) -> list[float]:
+        """Non-null hit scores (scores are null if custom sorting is used)."""
+        return self._cached_from_hits(
+            "scores",
+            lambda hits: [h["score"] for h in hits if h["score"] is not None],
+        )
 
     @property
     def max_score(self) -> float:
         """Max relevance score in the returned page."""
-        if self.hits:
-            return float(max(self._hit_values("score")))
-        return 0.0
+        return float(max(self._hit_scores, default=0.0))
 
     @property
     def min_score(self) -> float:
         """Min relevance score in the returned page."""
-        if self.hits:
-            return float(min(self._hit_values("score")))
-        return 0.0
+        return float(min(self._hit_scores, default=0.0))
 
     @property
     def object_ids(self) -> list[str]:
         """List of model ids extracted from hits."""
-        return self._hit_values("id")  # type: ignore
+        # return a copy so that callers cannot mutate the cached column
+        return list(self._hit_values("id"))  # type: ignore
 
     @property
     def page_slice(self) -> tuple[int, int] | None:
@@ -626,16 +1075,16 @@ class SearchQuery(models.Model):
     @property
     def page_from(self) -> int:
         """1-based index of the first hit in the returned page."""
-        if self.page_size == 0:
+        if not self.hits or not (page_slice := self.page_slice):
             return 0
-        if not self.page_slice:
-            return 0
-        return self.page_slice[0] + 1
+        return page_slice[0] + 1
 
     @property
     def page_to(self) -> int:
         """1-based index of the last hit in the returned page."""
-        return 0 if self.page_size == 0 else self.page_from + self.page_size - 1
+        if not (page_size := self.page_size):
+            return 0
+        return self.page_from + page_size - 1
 
     @property
     def page_size(self) -> int:
@@ -661,24 +1110,53 @@ class SearchQuery(models.Model):
             raise ValueError("Missing query attribute.")
         return "fields" in self.query
 
-    def search_rank_annotation(self, pk_field_name: str = "pk") -> Case | None:
-        """Return SQL CASE statement used to annotate results with rank."""
+    def search_annotations(
+        self, pk_field_name: str = "pk"
+    ) -> tuple[Case, Case | Value] | None:
+        """
+        Return SQL CASE statements used to annotate results with rank and score.
+
+        Both statements are built in a single pass over the hits. Hits with
+        a null score (if custom sorting has been applied) are omitted from
+        the score statement, as CASE returns null for unmatched rows anyway.
+
+        """
         if not self.hits:
             return None
         case_when_rank = []
+        case_when_score = []
         for rank, hit in enumerate(self.hits, start=1):
-            case_when_rank.append(When(**{pk_field_name: hit["id"]}, then=rank))
-        return Case(*case_when_rank)
+            pk_filter = {pk_field_name: hit["id"]}
+            case_when_rank.append(When(**pk_filter, then=rank))
+            if hit["score"] is not None:
+                case_when_score.append(When(**pk_filter, then=float(hit["score"])))
+        if not case_when_score:
+            return Case(*case_when_rank), Value(None, output_field=FloatField())
+        return Case(*case_when_rank), Case(*case_when_score)
+
+    def search_rank_annotation(self, pk_field_name: str = "pk") -> Case | None:
+        """Return SQL CASE statement used to annotate results with rank."""
+        if not self.hits:
+            return None
+        return Case(
+            *(
+                When(**{pk_field_name: hit["id"]}, then=rank)
+                for rank, hit in enumerate(self.hits, start=1)
+            )
+        )
 
-    def search_score_annotation(self, pk_field_name: str = "pk") -> Case | None:
+    def search_score_annotation(self, pk_field_name: str = "pk") -> Case | Value | None:
         """Return SQL CASE statement used to annotate results with score."""
         if not self.hits:
             return None
-        case_when_score = []
-        for hit in self.hits:
-            # if custom sorting has been applied, score is null
-            score = None if hit["score"] is None else float(hit["score"])
-            case_when_score.append(When(**{pk_field_name: hit["id"]}, then=score))
+        # if custom sorting has been applied, score is null
+        case_when_score = [
+            When(**{pk_field_name: hit["id"]}, then=float(hit["score"]))
+            for hit in self.hits
+            if hit["score"] is not None
+        ]
+        if not case_when_score:
+            return Value(None, output_field=FloatField())
         return Case(*case_when_score)
 
     def get_hit(self, doc_id: str) -> dict:
@@ -688,21 +1166,25 @@ class SearchQuery(models.Model):
         Raises KeyError if the id does not exist.
 
         """
-        if hit := [h for h in self.hits if h["id"] == str(doc_id)]:
-            return hit[0]
-        raise KeyError("Document id not found in search results.")
+        try:
+            return self._hits_by_id[str(doc_id)][1]
+        except KeyError:
+            raise KeyError("Document id not found in search results.")
 
     def get_doc_rank(self, doc_id: str) -> int:
         """Return the position of a document in the results."""
-        return self.object_ids.index(str(doc_id))
+        try:
+            return self._hits_by_id[str(doc_id)][0]
+        except KeyError:
+            raise ValueError("Document id not found in search results.")
 
     def get_doc_score(self, doc_id: str) -> float:
         """Return specific document score."""
-        return self.get_hit(str(doc_id))["score"]
+        return self.get_hit(doc_id)["score"]
 
     def get_doc_highlights(self, doc_id: str) -> dict | None:
         """Return specific document highlights."""
-        return self.get_hit(str(doc_id)).get("highlight")
+        return self.get_hit(doc_id).get("highlight")
 
     @classmethod
     def do_search(
@@ -713,24 +1195,91 @@ class SearchQuery(models.Model):
         **search_kwargs: Any,
     ) -> SearchQuery:
         """Perform a search query and parse the response."""
-        # if "from" has been passed in we need to convert it to "from_"
-        # for the search method, ensuring that we don't overwrite
-        # "from_" if it's been passed in correctly.
-        from_ = search_kwargs.pop("from", DEFAULT_FROM)
-        search_kwargs.setdefault("from_", from_)
-        search_kwargs.setdefault("size", DEFAULT_PAGE_SIZE)
-        search_kwargs.setdefault("_source", DEFAULT_INCLUDE_SOURCE)
+        search_kwargs = _search_kwargs(search_kwargs)
         with stopwatch() as timer:
             response = client.search(index=index, query=query, **search_kwargs)
+        return SearchQuery._from_search_response(
+            index, _raw_query(query, search_kwargs), response, timer
+        )
+
+    @classmethod
+    def do_multi_search(
+        self,
+        searches: Iterable[tuple[str, dict]],
+        client: Elasticsearch = DEFAULT_CLIENT,
+        **search_kwargs: Any,
+    ) -> list[SearchQuery]:
+        """
+        Perform multiple search queries in a single request (msearch api).
+
+        Each search is an (index, query) tuple, and the search_kwargs are
+        applied to every search. Returns a SearchQuery for each search, in
+        the same order. These are not saved - they can be saved in a single
+        query using `SearchQuery.objects.bulk_create`.
+
+        The search_kwargs in MSEARCH_HEADER_PARAMS (e.g. "routing",
+        "preference") are sent in the header line of each search, and all
+        others in the search body - so unlike `do_search` these must be
+        valid search request body properties. Query string only params
+        (e.g. "scroll", "typed_keys") are not supported.
+
+        NB the duration recorded for each search is that of the entire request.
+
+        If any of the searches fails an ApiError is raised (as it would be
+        by `do_search`), with the failed search's response as the body.
+
+        """
+        search_kwargs = _search_kwargs(search_kwargs)
+        header = {
+            key: search_kwargs.pop(key)
+            for key in list(search_kwargs)
+            if key in MSEARCH_HEADER_PARAMS
+        }
+        indexes = []
+        body: list[dict] = []
+        for index, query in searches:
+            indexes.append(index)
+            body += [{"index": index, **header}, _raw_query(query, search_kwargs)]
+        if not body:
+            return []
+        with stopwatch() as timer:
+            response = client.msearch(searches=body)
+        search_queries = []
+        for index, raw_query, item in zip(
+            indexes, body[1::2], response.body["responses"]
+        ):
+            if "error" in item:
+                error = item["error"]
+                raise ApiError(
+                    message=str(
+                        error.get("type") if isinstance(error, dict) else error
+                    ),
+                    # the msearch response status is 200, use the item status
+                    meta=dataclasses.replace(
+                        response.meta, status=item.get("status", response.meta.status)
+                    ),
+                    body=item,
+                )
+            item_response: ObjectApiResponse[Any] = ObjectApiResponse(
+                body=item, meta=response.meta
+            )
+            search_queries.append(
+                SearchQuery._from_search_response(
+                    index, raw_query, item_response, timer
+                )
+            )
+        return search_queries
+
+    @classmethod
+    def _from_search_response(
+        self,
+        index: str,
+        raw_query: dict,
+        response: ObjectApiResponse,
+        timer: stopwatch,
+    ) -> SearchQuery:
+        """Return a new (unsaved) SearchQuery from a search response."""
         parser = SearchResponseParser(response)
-        # HACK: we want the "query" that we store to be the raw wire query, which
-        # is a dict that contains query, aggs, highlights, from_, size, min_score,
-        # etc.
-        raw_query = {"query": copy.deepcopy(query)}
-        raw_query.update(**search_kwargs)
-        # now we need to replace "from_" with "from" for the stored
-        # JSON as this is what gets sent over the wire.
-        raw_query["from"] = raw_query.pop("from_")
         return SearchQuery(
             index=index,
             query=raw_query,
@@ -741,7 +1290,7 @@ class SearchQuery(models.Model):
             total_hits_relation=parser.total_hits_relation,
             executed_at=timer.started_at,
             duration=timer.elapsed,
-            query_response=response,
+            query_response=response if RETAIN_QUERY_RESPONSE else None,
         )
 
     @classmethod
@@ -769,6 +1318,50 @@ class SearchQuery(models.Model):
         )
 
 
+def _search_kwargs(search_kwargs: dict) -> dict:
+    """Return search kwargs with the default from, size and _source values set."""
+    # if "from" has been passed in we need to convert it to "from_"
+    # for the search method, ensuring that we don't overwrite
+    # "from_" if it's been passed in correctly.
+    from_ = search_kwargs.pop("from", DEFAULT_FROM)
+    search_kwargs.setdefault("from_", from_)
+    search_kwargs.setdefault("size", DEFAULT_PAGE_SIZE)
+    search_kwargs.setdefault("_source", DEFAULT_INCLUDE_SOURCE)
+    return search_kwargs
+
+
+def _raw_query(query: dict, search_kwargs: dict) -> dict:
+    """
+    Return the raw wire query stored as SearchQuery.query.
+
+    The query that we store is the raw wire query, which is a dict that
+    contains query, aggs, highlights, from, size, min_score, etc. NB the
+    query dict is stored as-is (not copied) - it must not be mutated by
+    the caller after the search has been executed.
+
+    """
+    raw_query = {"query": query, **search_kwargs}
+    # now we need to replace "from_" with "from" for the stored
+    # JSON as this is what gets sent over the wire.
+    raw_query["from"] = raw_query.pop("from_")
+    return raw_query
+
+
+def _format_hit(hit: dict) -> dict:
+    """Return the hit meta info stored in SearchQuery.hits."""
+    retval = {
+        # ids are always strings - this is what all hit lookups are keyed on
+        "id": str(hit["_id"]),
+        "index": hit["_index"],
+        "score": hit["_score"],
+    }
+    if highlight := hit.get("highlight"):
+        retval["highlight"] = highlight
+    if fields := hit.get("fields"):
+        retval["fields"] = fields
+    return retval
+
+
 class SearchResponseParser:
     def __init__(self, response: ObjectApiResponse) -> None:
         self.body = response.body
@@ -778,21 +1371,9 @@ class SearchResponseParser:
     def raw_hits(self) -> list[dict]:
         return self._hits.get("hits", {})
 
-    @property
+    @functools.cached_property
     def hits(self) -> list[dict]:
-        def _hit(hit: dict) -> dict:
-            retval = {
-                "id": hit["_id"],
-                "index": hit["_index"],
-                "score": hit["_score"],
-            }
-            if highlight := hit.get("highlight"):
-                retval["highlight"] = highlight
-            if fields := hit.get("fields"):
-                retval["fields"] = fields
-            return retval
-
-        return [_hit(h) for h in self.raw_hits]
+        return [_format_hit(h) for h in self.raw_hits]
 
     @property
     def total(self) -> dict:
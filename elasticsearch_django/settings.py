@@ -10,13 +10,16 @@ from the settings, as well as validation of settings.
 """
 from __future__ import annotations
 
+import functools
 import json
 import os
 from typing import Dict, Union
 
 from django.apps import apps
 from django.conf import settings as django_settings
+from django.core.signals import setting_changed
 from django.db.models import Model
+from django.dispatch import receiver
 from elasticsearch import Elasticsearch
 
 SettingType = Union[list, dict, int, str, bool]
@@ -24,13 +27,33 @@ SettingsType = Dict[str, SettingType]
 
 
 def get_client(connection: str = "default") -> Elasticsearch:
-    """Return configured elasticsearch client."""
+    """
+    Return configured elasticsearch client.
+
+    Clients are thread-safe, so one client is created per connection and
+    reused, which allows connections in its pool to be kept alive.
+
+    """
+    # always call positionally, as lru_cache keys on the call signature
+    return _get_client(connection)
+
+
+@functools.lru_cache(maxsize=None)
+def _get_client(connection: str) -> Elasticsearch:
+    """Create the elasticsearch client for a connection (memoized)."""
     conn_settings = get_connection_settings(connection)
     if isinstance(conn_settings, (str, list)):
         return Elasticsearch(conn_settings)
     return Elasticsearch(**conn_settings)
 
 
+@receiver(setting_changed)
+def _clear_clients(*, setting: str, **kwargs: object) -> None:
+    """Discard the cached clients if SEARCH_SETTINGS is overridden."""
+    if setting == "SEARCH_SETTINGS":
+        _get_client.cache_clear()
+
+
 def get_settings() -> SettingsType:
     """Return settings from Django conf."""
     return django_settings.SEARCH_SETTINGS["settings"]
@@ -83,7 +106,9 @@ def get_index_mapping(index: str) -> dict:
         return json.load(f)
 
 
-def get_model_index_properties(instance: Model, index: str) -> list[str]:
+def get_model_index_properties(
+    instance: Model | type[Model], index: str
+) -> list[str]:
     """Return the list of properties specified for a model in an index."""
     mapping = get_index_mapping(index)
     return list(mapping["mappings"]["properties"].keys())
@@ -1,6 +1,7 @@
 from unittest import mock
 
 import pytest
+from django.core.cache import cache
 from django.core.exceptions import ImproperlyConfigured
 
 import elasticsearch_django
@@ -8,6 +9,7 @@ from elasticsearch_django.apps import (
     ElasticAppConfig,
     _connect_signals,
     _delete_from_search_index,
+    _in_search_queryset,
     _on_model_delete,
     _on_model_save,
     _update_search_index,
@@ -17,7 +19,7 @@ from elasticsearch_django.apps import (
 )
 from elasticsearch_django.models import SearchDocumentMixin
 
-from .models import ExampleModel
+from .models import ExampleModel, ExampleModelManager
 
 
 class SearchAppsConfigTests:
@@ -200,3 +202,35 @@ class SearchAppsValidationTests:
         obj.index_search_document.assert_not_called()
         obj.update_search_document.assert_not_called()
         obj.delete_search_document.assert_not_called()
+
+    @mock.patch.object(ExampleModelManager, "in_search_queryset")
+    def test__in_search_queryset(self, mock_in_qs):
+        """Test the _in_search_queryset function queries every time by default."""
+        mock_in_qs.return_value = True
+        obj = ExampleModel(pk=1, simple_field_2="foo")
+        assert _in_search_queryset(instance=obj, index="foo")
+        assert _in_search_queryset(instance=obj, index="foo")
+        assert mock_in_qs.call_count == 2
+        mock_in_qs.assert_called_with(1, index="foo")
+
+    @mock.patch("elasticsearch_django.apps.settings.auto_sync", lambda x: False)
+    @mock.patch.object(ExampleModelManager, "in_search_queryset")
+    def test__in_search_queryset__cached(self, mock_in_qs):
+        """Test the _in_search_queryset function with the result cache enabled."""
+        cache.clear()
+        mock_in_qs.return_value = False
+        obj = ExampleModel(pk=1, simple_field_2="foo")
+        with mock.patch.dict(
+            "django.conf.settings.SEARCH_SETTINGS",
+            {"settings": {"in_search_queryset_cache_expiry": 60}},
+        ):
+            assert not _in_search_queryset(instance=obj, index="foo")
+            assert not _in_search_queryset(instance=obj, index="foo")
+            assert mock_in_qs.call_count == 1
+            # a different index is cached separately
+            assert not _in_search_queryset(instance=obj, index="bar")
+            assert mock_in_qs.call_count == 2
+            # deleting the object clears the cached value
+            _delete_from_search_index(instance=obj, index="foo")
+            assert not _in_search_queryset(instance=obj, index="foo")
+            assert mock_in_qs.call_count == 3
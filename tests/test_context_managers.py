@@ -0,0 +1,18 @@
+from datetime import timedelta
+from unittest import mock
+
+from elasticsearch_django.context_managers import stopwatch
+
+
+class StopwatchTests:
+    @mock.patch("elasticsearch_django.context_managers.time.perf_counter")
+    def test_elapsed(self, mock_counter: mock.MagicMock) -> None:
+        mock_counter.side_effect = [10.0, 11.0, 12.5]
+        with stopwatch() as timer:
+            assert timer.in_progress
+            assert timer.elapsed == 1.0
+        assert not timer.in_progress
+        assert timer.stopped_at >= timer.started_at
+        # includes whole seconds, not just the microseconds component
+        assert timer.elapsed == 2.5
+        assert timer.duration == timedelta(seconds=2.5)
@@ -1,8 +1,16 @@
+from unittest import mock
+
+from django.core.cache import cache
 from django.db.models import signals
 from django.test import TestCase
 
 from elasticsearch_django.apps import _on_model_save
-from elasticsearch_django.decorators import disable_search_updates
+from elasticsearch_django.decorators import (
+    batch_search_updates,
+    disable_search_updates,
+)
+
+from .models import ExampleModel
 
 
 class DecoratorTests(TestCase):
@@ -19,3 +27,71 @@ class DecoratorTests(TestCase):
         with disable_search_updates():
             self.assertEqual(signals.post_save.receivers, [])
         self.assertEqual(signals.post_save.receivers[0][1](), _on_model_save)
+
+    @mock.patch("elasticsearch_django.decorators._bulk")
+    @mock.patch("elasticsearch_django.decorators.get_client")
+    @mock.patch("elasticsearch_django.models.get_client")
+    @mock.patch.object(ExampleModel, "as_search_document_update")
+    def test_batch_search_updates(
+        self, mock_update, mock_models_client, mock_client, mock_bulk
+    ):
+        """Check search actions are collected and sent in a single bulk call."""
+        cache.clear()
+        mock_bulk.return_value = (3, [])
+        mock_update.return_value = {"simple_field_1": 1}
+        obj1 = ExampleModel(pk=1, simple_field_1=1, simple_field_2="foo")
+        obj2 = ExampleModel(pk=2, simple_field_1=1, simple_field_2="bar")
+        with batch_search_updates():
+            obj1.update_search_document(index="foo", update_fields=["simple_field_1"])
+            with batch_search_updates():
+                obj2.index_search_document(index="foo")
+                obj2.delete_search_document(index="foo")
+            mock_bulk.assert_not_called()
+        mock_models_client.assert_not_called()
+        mock_bulk.assert_called_once()
+        client, actions = mock_bulk.call_args[0]
+        assert client == mock_client.return_value
+        assert mock_bulk.call_args[1] == {"raise_on_error": False}
+        assert actions == [
+            {
+                "_index": "foo",
+                "_op_type": "update",
+                "_id": obj1.get_search_document_id(),
+                "doc": {"simple_field_1": 1},
+                "retry_on_conflict": 0,
+            },
+            obj2.as_search_action(index="foo", action="index"),
+            obj2.as_search_action(index="foo", action="delete"),
+        ]
+        # outside the block updates are sent immediately
+        mock_update.return_value = {"simple_field_1": 2}
+        obj1.update_search_document(index="foo", update_fields=["simple_field_1"])
+        mock_models_client.return_value.update.assert_called_once()
+
+    @mock.patch("elasticsearch_django.decorators._bulk")
+    @mock.patch("elasticsearch_django.decorators.get_client")
+    def test_batch_search_updates__batch_size(self, mock_client, mock_bulk):
+        """Check actions are sent each time bulk_batch_size is reached."""
+        mock_bulk.return_value = (2, [])
+        objects = [ExampleModel(pk=i, simple_field_1=i) for i in range(5)]
+        with mock.patch.dict(
+            "django.conf.settings.SEARCH_SETTINGS",
+            {"settings": {"chunk_size": 500, "bulk_batch_size": 2}},
+        ):
+            with batch_search_updates():
+                for obj in objects:
+                    obj.delete_search_document(index="foo")
+        assert [len(c[0][1]) for c in mock_bulk.call_args_list] == [2, 2, 1]
+
+    @mock.patch("elasticsearch_django.decorators.get_client")
+    def test_batch_search_updates__errors(self, mock_client):
+        """Check failed actions are logged rather than raised."""
+        error = {"delete": {"_id": "1_", "status": 404, "result": "not_found"}}
+        mock_es_bulk = mock_client.return_value.options.return_value.bulk
+        mock_es_bulk.return_value = mock.Mock(body={"errors": True, "items": [error]})
+        obj = ExampleModel(pk=1, simple_field_1=1)
+        with self.assertLogs("elasticsearch_django.decorators", "ERROR") as logs:
+            with batch_search_updates():
+                obj.delete_search_document(index="foo")
+        mock_es_bulk.assert_called_once()
+        assert "not_found" in logs.output[0]
@@ -0,0 +1,92 @@
+import dataclasses
+import datetime
+import decimal
+import enum
+import json
+import uuid
+from unittest import mock
+
+import pytest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.translation import gettext_lazy
+
+from elasticsearch_django.encoders import HAS_ORJSON, SearchJSONEncoder, dumps_sorted
+
+VALUE = {
+    "datetime": datetime.datetime(2023, 1, 2, 3, 4, 5, 678901),
+    "date": datetime.date(2023, 1, 2),
+    "decimal": decimal.Decimal("1.10"),
+    "uuid": uuid.UUID("d5a1b0b8-5fd8-4a0c-a2d4-f0d4b2b7a2a1"),
+    "lazy": gettext_lazy("foo"),
+    "duration": datetime.timedelta(seconds=90),
+    "hits": [{"id": "1", "score": 1.5, "highlight": {"name": ["<em>é</em>"]}}],
+    1: "int key",
+}
+
+
+class SearchJSONEncoderTests:
+    def test_encode(self) -> None:
+        """Test the encoded value is the same as that from DjangoJSONEncoder."""
+        assert json.loads(json.dumps(VALUE, cls=SearchJSONEncoder)) == json.loads(
+            json.dumps(VALUE, cls=DjangoJSONEncoder)
+        )
+
+    @mock.patch("elasticsearch_django.encoders.HAS_ORJSON", False)
+    def test_encode__no_orjson(self) -> None:
+        assert json.dumps(VALUE, cls=SearchJSONEncoder) == json.dumps(
+            VALUE, cls=DjangoJSONEncoder
+        )
+
+    def test_encode__big_int(self) -> None:
+        assert (
+            json.dumps({"x": 2**70}, cls=SearchJSONEncoder)
+            == '{"x": 1180591620717411303424}'
+        )
+
+    @pytest.mark.skipif(not HAS_ORJSON, reason="orjson is not installed")
+    def test_encode__non_finite(self) -> None:
+        """Test NaN / Infinity are encoded as null by orjson (not NaN)."""
+        value = {"x": float("nan"), "y": float("inf")}
+        assert json.dumps(value, cls=SearchJSONEncoder) == '{"x":null,"y":null}'
+
+    @mock.patch("elasticsearch_django.encoders.HAS_ORJSON", False)
+    def test_encode__non_finite__no_orjson(self) -> None:
+        value = {"x": float("nan"), "y": float("inf")}
+        assert json.dumps(value, cls=SearchJSONEncoder) == ('{"x": NaN, "y": Infinity}')
+
+    @pytest.mark.skipif(not HAS_ORJSON, reason="orjson is not installed")
+    def test_encode__native_types(self) -> None:
+        """Test orjson serializes types that DjangoJSONEncoder rejects."""
+
+        @dataclasses.dataclass
+        class Point:
+            x: int
+
+        class Colour(enum.Enum):
+            RED = "red"
+
+        value = {"point": Point(1), "colour": Colour.RED}
+        assert json.dumps(value, cls=SearchJSONEncoder) == (
+            '{"point":{"x":1},"colour":"red"}'
+        )
+        with pytest.raises(TypeError):
+            json.dumps(value, cls=DjangoJSONEncoder)
+
+    def test_encode__invalid(self) -> None:
+        with pytest.raises(TypeError):
+            json.dumps({"x": object()}, cls=SearchJSONEncoder)
+
+
+class DumpsSortedTests:
+    def test_dumps_sorted(self) -> None:
+        value = {"b": VALUE["decimal"], "a": VALUE["datetime"]}
+        assert dumps_sorted(value) == b'{"a":"2023-01-02T03:04:05.678","b":"1.10"}'
+        assert dumps_sorted(value) == dumps_sorted(dict(reversed(value.items())))
+
+    @mock.patch("elasticsearch_django.encoders.HAS_ORJSON", False)
+    def test_dumps_sorted__no_orjson(self) -> None:
+        value = {"b": VALUE["decimal"], "a": VALUE["datetime"]}
+        assert dumps_sorted(value) == b'{"a":"2023-01-02T03:04:05.678","b":"1.10"}'
+
+    def test_dumps_sorted__big_int(self) -> None:
+        assert dumps_sorted({"x": 2**70}) == b'{"x":1180591620717411303424}'
@@ -1,12 +1,17 @@
 from unittest import mock
 
 import pytest
+from django.core.cache import cache
+from django.db.models.query import QuerySet
 
 from elasticsearch_django.index import (
+    _bulk,
     _prune_hit,
     bulk_actions,
     create_index,
+    delete_documents,
     delete_index,
+    index_documents,
     prune_index,
     scan_index,
     update_index,
@@ -50,6 +55,86 @@ class IndexFunctionTests:
         responses = update_index("foo")
         assert responses == [mock_bulk.return_value]
 
+    @mock.patch("elasticsearch_django.index.get_client")
+    @mock.patch("elasticsearch_django.index._bulk")
+    def test_index_documents(self, mock_bulk, mock_client):
+        """Test the index_documents function skips unchanged documents."""
+        cache.clear()
+        objects = [
+            ExampleModel(pk=1, simple_field_1=1, simple_field_2="foo"),
+            ExampleModel(pk=2, simple_field_1=2, simple_field_2="bar"),
+        ]
+        mock_bulk.return_value = (2, [])
+        assert index_documents(objects, "foo") == (2, [])
+        actions = mock_bulk.call_args[0][1]
+        assert [a["_id"] for a in actions] == ["1_foo", "2_bar"]
+        assert actions[0] == objects[0].as_search_action(index="foo", action="index")
+
+        # second time around nothing has changed
+        mock_bulk.reset_mock()
+        assert index_documents(objects, "foo") == (0, [])
+        mock_bulk.assert_not_called()
+
+        # update one object - only that one is sent
+        objects[1].simple_field_2 = "baz"
+        mock_bulk.return_value = (1, [])
+        assert index_documents(objects, "foo") == (1, [])
+        assert [a["_id"] for a in mock_bulk.call_args[0][1]] == ["2_baz"]
+
+        # the cache is per index, so a different index gets every document
+        mock_bulk.return_value = (2, [])
+        assert index_documents(objects, "bar") == (2, [])
+
+    @mock.patch("elasticsearch_django.index.get_client")
+    @mock.patch("elasticsearch_django.index._bulk")
+    def test_delete_documents(self, mock_bulk, mock_client):
+        """Test the delete_documents function clears the cache and bulk deletes."""
+        cache.clear()
+        objects = [
+            ExampleModel(pk=1, simple_field_1=1, simple_field_2="foo"),
+            ExampleModel(pk=2, simple_field_1=2, simple_field_2="bar"),
+        ]
+        index_documents(objects, "foo")
+        assert cache.get(f"{objects[0].search_document_cache_key}:foo") is not None
+        mock_bulk.reset_mock()
+        mock_bulk.return_value = (2, [])
+        assert delete_documents(objects, "foo") == (2, [])
+        mock_bulk.assert_called_once_with(
+            mock_client.return_value,
+            [
+                {"_index": "foo", "_op_type": "delete", "_id": "1_foo"},
+                {"_index": "foo", "_op_type": "delete", "_id": "2_bar"},
+            ],
+        )
+        assert cache.get(f"{objects[0].search_document_cache_key}:foo") is None
+        assert cache.get(f"{objects[1].search_document_cache_key}:foo") is None
+
+        mock_bulk.reset_mock()
+        assert delete_documents([], "foo") == (0, [])
+        mock_bulk.assert_not_called()
+
+    @mock.patch("elasticsearch_django.index.helpers")
+    def test__bulk(self, mock_helpers):
+        """Test the _bulk function uses parallel_bulk if configured."""
+        client = mock.Mock()
+        assert _bulk(client, ["a"]) == mock_helpers.bulk.return_value
+        mock_helpers.bulk.assert_called_once_with(
+            client, ["a"], chunk_size=500, raise_on_error=True
+        )
+        mock_helpers.parallel_bulk.assert_not_called()
+
+        mock_helpers.parallel_bulk.return_value = iter(
+            [(True, {}), (False, {"index": {"error": "x"}}), (True, {})]
+        )
+        with mock.patch.dict(
+            "django.conf.settings.SEARCH_SETTINGS",
+            {"settings": {"chunk_size": 100, "parallel_bulk": True}},
+        ):
+            assert _bulk(client, ["a"]) == (2, [{"index": {"error": "x"}}])
+        mock_helpers.parallel_bulk.assert_called_once_with(
+            client, ["a"], chunk_size=100, thread_count=4, raise_on_error=True
+        )
+
     @mock.patch("elasticsearch_django.index.get_client")
     def test_delete_index(self, mock_client):
         """Test the delete_index function."""
@@ -133,3 +218,33 @@ class IndexFunctionTests:
 
         # now let's add in a bad object, and check we still get the good one
         assert list(bulk_actions([ExampleModel(), "bad"], "foo", "update")) == ["foo"]
+
+    @mock.patch.object(ExampleModel, "as_search_action")
+    def test_bulk_actions__queryset(self, mock_action):
+        """Test the bulk_actions function streams querysets."""
+        mock_action.return_value = "foo"
+        qs = ExampleModel.objects.all()
+        with mock.patch.object(QuerySet, "iterator") as mock_iterator:
+            mock_iterator.return_value = iter([ExampleModel(), ExampleModel()])
+            assert list(bulk_actions(qs, "foo", "index")) == ["foo", "foo"]
+        mock_iterator.assert_called_once_with(500)
+        # the queryset itself has not been evaluated
+        assert qs._result_cache is None
+
+    @mock.patch("elasticsearch_django.models.ITERATOR_SUPPORTS_PREFETCH", False)
+    @mock.patch.object(ExampleModel, "as_search_action")
+    def test_bulk_actions__queryset__prefetch(self, mock_action):
+        """Test prefetching querysets are not streamed on Django < 4.1."""
+        mock_action.return_value = "foo"
+        qs = ExampleModel.objects.prefetch_related("user")
+        with mock.patch.object(
+            QuerySet, "iterator"
+        ) as mock_iterator, mock.patch.object(QuerySet, "_fetch_all"):
+            qs._result_cache = [ExampleModel()]
+            assert list(bulk_actions(qs, "foo", "index")) == ["foo"]
+        mock_iterator.assert_not_called()
+        with mock.patch("elasticsearch_django.models.ITERATOR_SUPPORTS_PREFETCH", True):
+            with mock.patch.object(QuerySet, "iterator") as mock_iterator:
+                mock_iterator.return_value = iter([])
+                assert list(bulk_actions(qs, "foo", "index")) == []
+            mock_iterator.assert_called_once_with(500)
@@ -4,12 +4,24 @@ from unittest import mock
 from uuid import uuid4
 
 import pytest
+from django.conf import settings
 from django.core.cache import cache
+from django.db import connection
+from django.db.models import Value
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.utils.timezone import now as tz_now
-from elastic_transport import ObjectApiResponse
-from elasticsearch import Elasticsearch
+from elastic_transport import (
+    ApiResponseMeta,
+    HttpHeaders,
+    NodeConfig,
+    ObjectApiResponse,
+)
+from elasticsearch import ApiError, Elasticsearch
 
 # from elasticsearch_django.api import Count, Search
+from elasticsearch_django.decorators import batch_search_updates
+from elasticsearch_django.index import index_documents
 from elasticsearch_django.models import (
     UPDATE_STRATEGY_FULL,
     UPDATE_STRATEGY_PARTIAL,
@@ -17,6 +29,11 @@ from elasticsearch_django.models import (
     SearchDocumentMixin,
     SearchQuery,
     SearchResponseParser,
+    _clean_update_fields,
+    _document_digest,
+    _related_field_names,
+    _search_fields,
+    _search_indexes,
 )
 
 from .models import (
@@ -24,6 +41,7 @@ from .models import (
     ExampleModelManager,
     ExampleModelWithCustomPrimaryKey,
     ModelA,
+    ModelAQuerySet,
     ModelB,
 )
 
@@ -31,6 +49,13 @@ from .models import (
 class SearchDocumentMixinTests:
     """Tests for the SearchDocumentMixin."""
 
+    @pytest.fixture(autouse=True)
+    def clear_memoized(self) -> None:
+        # mapping properties are memoized per class, but are mocked per test
+        _search_fields.cache_clear()
+        _search_indexes.cache_clear()
+        _clean_update_fields.cache_clear()
+
     @pytest.fixture
     def test_obj(self) -> ExampleModel:
         return ExampleModel(pk=1, simple_field_1=99, simple_field_2="foo")
@@ -38,16 +63,49 @@ class SearchDocumentMixinTests:
     @mock.patch("elasticsearch_django.models.get_model_indexes")
     def test_search_indexes(self, mock_indexes, test_obj: ExampleModel):
         """Test the search_indexes function."""
-        mock_indexes.return_value = "foo"
-        assert test_obj.search_indexes == "foo", test_obj.search_indexes
+        mock_indexes.return_value = ["foo"]
+        assert test_obj.search_indexes == ["foo"], test_obj.search_indexes
+        # memoized per model class
+        assert test_obj.search_indexes == ["foo"]
         mock_indexes.assert_called_once_with(ExampleModel)
 
+    def test_search_indexes__settings_changed(self, test_obj: ExampleModel):
+        assert test_obj.search_indexes == ["examples"]
+        search_settings = {
+            **settings.SEARCH_SETTINGS,
+            "indexes": {"foo": {"models": []}},
+        }
+        with override_settings(SEARCH_SETTINGS=search_settings):
+            assert test_obj.search_indexes == []
+        assert test_obj.search_indexes == ["examples"]
+
+    def test_search_document_cache_key(self, test_obj: ExampleModel):
+        assert (
+            test_obj.search_document_cache_key
+            == "elasticsearch_django:tests.examplemodel.99_foo"
+        )
+
     def test_as_search_document(self):
         """Test the as_search_document method."""
         obj = SearchDocumentMixin()
         with pytest.raises(NotImplementedError):
             obj.as_search_document(index="_all")
 
+    def test_as_search_document__fields(self):
+        """Test the as_search_document method with search_document_fields."""
+        obj = SearchDocumentMixin()
+        obj.search_document_fields = ("foo", "bar.baz")
+        obj.foo = 1
+        obj.bar = mock.Mock(baz="qux")
+        assert obj.as_search_document(index="_all") == {"foo": 1, "bar.baz": "qux"}
+
+    def test_as_search_document__fields_list(self):
+        """Test the as_search_document method with a list of fields."""
+        obj = SearchDocumentMixin()
+        obj.search_document_fields = ["foo"]
+        obj.foo = 1
+        assert obj.as_search_document(index="_all") == {"foo": 1}
+
     @mock.patch("elasticsearch_django.models.get_model_index_properties")
     def test_clean_update_fields(self, mock_properties, test_obj: ExampleModel):
         """Test that only fields in the mapping file are cleaned."""
@@ -55,6 +113,9 @@ class SearchDocumentMixinTests:
         assert test_obj.clean_update_fields(
             index="", update_fields=["simple_field_1", "simple_field_2"]
         ) == ["simple_field_1"]
+        # the mapping properties are memoized per model class / index
+        test_obj.clean_update_fields(index="", update_fields=["simple_field_1"])
+        mock_properties.assert_called_once_with(ExampleModel, "")
 
     @mock.patch("elasticsearch_django.models.get_model_index_properties")
     def test_clean_update_fields_related_field(
@@ -69,6 +130,40 @@ class SearchDocumentMixinTests:
                 update_fields=["simple_field_1", "complex_field", "user"],
             )
 
+    def test__related_fields(self, test_obj: ExampleModel):
+        assert test_obj._related_fields == ["user"]
+
+    def test__related_fields__order(self, test_obj: ExampleModel):
+        fields = [
+            mock.Mock(is_relation=True),
+            mock.Mock(is_relation=False),
+            mock.Mock(is_relation=True),
+        ]
+        for field, name in zip(fields, ["zed", "simple", "alpha"]):
+            field.name = name
+        _related_field_names.cache_clear()
+        try:
+            with mock.patch.object(ExampleModel._meta, "get_fields", lambda: fields):
+                assert test_obj._related_fields == ["zed", "alpha"]
+        finally:
+            _related_field_names.cache_clear()
+
+    @mock.patch("elasticsearch_django.models.get_model_index_properties")
+    def test_clean_update_fields__memoized(
+        self, mock_properties, test_obj: ExampleModel
+    ):
+        """Test the clean_update_fields method memoizes the cleaned fields."""
+        mock_properties.return_value = ["simple_field_1"]
+        update_fields = ["simple_field_1", "simple_field_2"]
+        assert test_obj.clean_update_fields("_all", update_fields) == ["simple_field_1"]
+        assert test_obj.clean_update_fields("_all", update_fields) == ["simple_field_1"]
+        assert _clean_update_fields.cache_info().hits == 1
+        mock_properties.assert_called_once_with(ExampleModel, "_all")
+
+    def test_clean_update_fields__bounded(self):
+        """Test the clean_update_fields cache does not grow without bound."""
+        assert _clean_update_fields.cache_info().maxsize == 1024
+
     @mock.patch("elasticsearch_django.models.get_model_index_properties")
     def test_as_search_document_update_full(
         self, mock_properties, test_obj: ExampleModel
@@ -97,8 +192,15 @@ class SearchDocumentMixinTests:
             "simple_field_2": test_obj.simple_field_2,
         }
 
+        # no update_fields - no need to check the mapping
+        mock_properties.reset_mock()
+        assert test_obj.as_search_document_update(index="_all", update_fields=[]) == {}
+        mock_properties.assert_not_called()
+
         # remove simple_field_2 from the mapping - should no longer be included
         mock_properties.return_value = ["simple_field_1"]
+        _search_fields.cache_clear()
+        _clean_update_fields.cache_clear()
         assert test_obj.as_search_document_update(
             index="_all", update_fields=["simple_field_1", "simple_field_2"]
         ) == {"simple_field_1": test_obj.simple_field_1}
@@ -112,10 +214,10 @@ class SearchDocumentMixinTests:
         """Test the index_search_document sets the cache."""
         # obj = ExampleModel(pk=1, simple_field_1=1, simple_field_2="foo")
         doc = test_obj.as_search_document(index="_all")
-        key = test_obj.search_document_cache_key
+        key = f"{test_obj.search_document_cache_key}:_all"
         assert cache.get(key) is None
         test_obj.index_search_document(index="_all")
-        assert cache.get(key) == doc
+        assert cache.get(key) == _document_digest(doc)
         mock_client.return_value.index.assert_called_once_with(
             index="_all",
             document=doc,
@@ -130,21 +232,107 @@ class SearchDocumentMixinTests:
     def test_index_search_document_cached(self, mock_client, test_obj: ExampleModel):
         """Test the index_search_document does not update if doc is a duplicate."""
         doc = test_obj.as_search_document(index="_all")
-        key = test_obj.search_document_cache_key
-        cache.set(key, doc, timeout=1)
-        assert cache.get(key) == doc
+        key = f"{test_obj.search_document_cache_key}:_all"
+        cache.set(key, _document_digest(doc), timeout=1)
         test_obj.index_search_document(index="_all")
         assert mock_client.call_count == 0
 
+    @mock.patch("elasticsearch_django.models.CACHE_EXPIRY", 0)
+    @mock.patch("elasticsearch_django.models.get_client")
+    def test_index_search_document__cache_disabled(
+        self, mock_client, test_obj: ExampleModel
+    ):
+        """Test the index_search_document ignores the cache if cache_expiry is 0."""
+        cache.clear()
+        doc = test_obj.as_search_document(index="_all")
+        with mock.patch.object(cache, "get_many") as mock_get_many:
+            test_obj.index_search_document(index="_all")
+            test_obj.index_search_document(index="_all")
+            test_obj.delete_search_document(index="_all")
+        mock_get_many.assert_not_called()
+        assert cache.get(f"{test_obj.search_document_cache_key}:_all") is None
+        mock_client.return_value.index.assert_called_with(
+            index="_all", document=doc, id=test_obj.get_search_document_id()
+        )
+        assert mock_client.return_value.index.call_count == 2
+
+    def test_document_digest(self) -> None:
+        digest = _document_digest({"a": 1, "b": datetime.date(2023, 1, 1)})
+        assert len(digest) == 32
+        assert digest == _document_digest({"b": datetime.date(2023, 1, 1), "a": 1})
+        assert digest != _document_digest({"a": 2, "b": datetime.date(2023, 1, 1)})
+
+    @mock.patch("elasticsearch_django.models.get_client")
+    def test_index_search_document_version(self, mock_client, test_obj: ExampleModel):
+        """Test the index_search_document skips building doc if version unchanged."""
+        cache.clear()
+        key = f"{test_obj.search_document_cache_key}:_all"
+        with mock.patch.object(
+            ExampleModel, "search_document_version", return_value="v1"
+        ):
+            with mock.patch.object(
+                cache, "get_many", wraps=cache.get_many
+            ) as mock_get_many:
+                test_obj.index_search_document(index="_all")
+            # digest and version are fetched in a single round trip
+            mock_get_many.assert_called_once_with([key, f"{key}:ver"])
+            assert cache.get(f"{key}:ver") == "v1"
+            assert mock_client.return_value.index.call_count == 1
+            with mock.patch.object(ExampleModel, "as_search_document") as mock_doc:
+                test_obj.index_search_document(index="_all")
+                mock_doc.assert_not_called()
+            assert mock_client.return_value.index.call_count == 1
+        test_obj.delete_search_document(index="_all")
+        assert cache.get(f"{key}:ver") is None
+
+    @mock.patch("elasticsearch_django.models.get_client")
+    def test_index_search_document_version__unchanged_document(
+        self, mock_client, test_obj: ExampleModel
+    ):
+        """Test a new version is cached even if the document is unchanged."""
+        cache.clear()
+        key = f"{test_obj.search_document_cache_key}:_all"
+        with mock.patch.object(ExampleModel, "search_document_version") as mock_ver:
+            mock_ver.return_value = "v1"
+            test_obj.index_search_document(index="_all")
+            mock_ver.return_value = "v2"
+            test_obj.index_search_document(index="_all")
+            assert cache.get(f"{key}:ver") == "v2"
+            with mock.patch.object(ExampleModel, "as_search_document") as mock_doc:
+                test_obj.index_search_document(index="_all")
+                mock_doc.assert_not_called()
+        assert mock_client.return_value.index.call_count == 1
+
+    @mock.patch("elasticsearch_django.models.get_client")
+    def test_index_search_document__multiple_indexes(
+        self, mock_client, test_obj: ExampleModel
+    ):
+        """Test the document digest and version are cached per index."""
+        cache.clear()
+        with mock.patch.object(
+            ExampleModel, "search_document_version", return_value="v1"
+        ):
+            test_obj.index_search_document(index="foo")
+            test_obj.index_search_document(index="bar")
+            test_obj.index_search_document(index="bar")
+        assert [
+            c.kwargs["index"] for c in mock_client.return_value.index.mock_calls
+        ] == [
+            "foo",
+            "bar",
+        ]
+        test_obj.delete_search_document(index="foo")
+        key = test_obj.search_document_cache_key
+        assert cache.get(f"{key}:foo:ver") is None
+        assert cache.get(f"{key}:bar:ver") == "v1"
+
     @mock.patch(
         "elasticsearch_django.settings.get_connection_settings",
         lambda: "http://testserver",
     )
-    @mock.patch("elasticsearch_django.models.get_setting")
+    @mock.patch("elasticsearch_django.models.RETRY_ON_CONFLICT", 3)
     @mock.patch("elasticsearch_django.models.get_client")
-    def test_update_search_document(
-        self, mock_client, mock_setting, test_obj: ExampleModel
-    ):
+    def test_update_search_document(self, mock_client, test_obj: ExampleModel):
         """Test the update_search_document wraps up doc correctly."""
         doc = test_obj.as_search_document_update(
             index="_all", update_fields=["simple_field_1"]
@@ -154,9 +342,96 @@ class SearchDocumentMixinTests:
             index="_all",
             id=test_obj.get_search_document_id(),
             doc=doc,
-            retry_on_conflict=mock_setting.return_value,
+            retry_on_conflict=3,
         )
-        mock_setting.assert_called_once_with("retry_on_conflict", 0)
+
+    @mock.patch("elasticsearch_django.models.get_client")
+    def test_update_search_document__unchanged(
+        self, mock_client, test_obj: ExampleModel
+    ):
+        """Test the update_search_document ignores repeated identical updates."""
+        cache.clear()
+        key = f"{test_obj.search_document_cache_key}:_all"
+        test_obj.index_search_document(index="_all")
+        assert cache.get(key) is not None
+        with mock.patch.object(
+            ExampleModel, "as_search_document_update", return_value={"a": 1}
+        ):
+            test_obj.update_search_document(index="_all", update_fields=["a"])
+            test_obj.update_search_document(index="_all", update_fields=["a"])
+        assert mock_client.return_value.update.call_count == 1
+        # the full document cache is cleared as the indexed document has changed
+        assert cache.get(key) is None
+        # re-indexing the full document clears the partial update cache
+        test_obj.index_search_document(index="_all")
+        assert mock_client.return_value.index.call_count == 2
+        assert cache.get(f"{key}:partial") is None
+
+    @mock.patch("elasticsearch_django.models.get_client")
+    def test_update_search_document__error(self, mock_client, test_obj: ExampleModel):
+        """Test a failed update is not cached, so the same update is re-sent."""
+        cache.clear()
+        mock_update = mock_client.return_value.update
+        mock_update.side_effect = [Exception("timeout"), None]
+        with mock.patch.object(
+            ExampleModel, "as_search_document_update", return_value={"a": 1}
+        ):
+            with pytest.raises(Exception):
+                test_obj.update_search_document(index="foo", update_fields=["a"])
+            test_obj.update_search_document(index="foo", update_fields=["a"])
+            assert mock_update.call_count == 2
+            # the second (successful) update is cached
+            test_obj.update_search_document(index="foo", update_fields=["a"])
+            assert mock_update.call_count == 2
+
+    @mock.patch("elasticsearch_django.decorators._bulk")
+    @mock.patch("elasticsearch_django.models.get_client")
+    def test_update_search_document__batch(
+        self, mock_client, mock_bulk, test_obj: ExampleModel
+    ):
+        """Test updates sent within batch_search_updates are not cached."""
+        cache.clear()
+        mock_bulk.return_value = (0, [{"update": {"status": 500}}])
+        with mock.patch.object(
+            ExampleModel, "as_search_document_update", return_value={"a": 1}
+        ):
+            with batch_search_updates():
+                test_obj.update_search_document(index="foo", update_fields=["a"])
+            test_obj.update_search_document(index="foo", update_fields=["a"])
+        assert mock_bulk.call_count == 1
+        assert mock_client.return_value.update.call_count == 1
+
+    @mock.patch("elasticsearch_django.models.get_client")
+    def test_update_search_document__multiple_indexes(
+        self, mock_client, test_obj: ExampleModel
+    ):
+        """Test the partial update cache is per index."""
+        cache.clear()
+        with mock.patch.object(
+            ExampleModel, "as_search_document_update", return_value={"a": 1}
+        ):
+            test_obj.update_search_document(index="foo", update_fields=["a"])
+            test_obj.update_search_document(index="bar", update_fields=["a"])
+        assert [
+            c.kwargs["index"] for c in mock_client.return_value.update.mock_calls
+        ] == ["foo", "bar"]
+
+    @mock.patch("elasticsearch_django.index._bulk")
+    @mock.patch("elasticsearch_django.models.get_client")
+    def test_update_search_document__after_index_documents(
+        self, mock_client, mock_bulk, test_obj: ExampleModel
+    ):
+        """Test that bulk indexing the full document clears the partial cache."""
+        cache.clear()
+        mock_bulk.return_value = (1, [])
+        with mock.patch.object(
+            ExampleModel, "as_search_document_update", return_value={"a": 1}
+        ):
+            test_obj.update_search_document(index="foo", update_fields=["a"])
+            index_documents([test_obj], "foo")
+            test_obj.update_search_document(index="foo", update_fields=["a"])
+        assert mock_bulk.call_count == 1
+        assert mock_client.return_value.update.call_count == 2
 
     @mock.patch(
         "elasticsearch_django.settings.get_connection_settings",
@@ -170,7 +445,12 @@ class SearchDocumentMixinTests:
         ) as mock_update:
             mock_update.return_value = {}
             # this will return an empty dictionary as the partial update doc
+            test_obj.update_search_document(index="_all", update_fields=["foo"])
+            mock_client.return_value.update.assert_not_called()
+            mock_update.reset_mock()
+            # no update_fields - document is not even built
             test_obj.update_search_document(index="_all", update_fields=[])
+            mock_update.assert_not_called()
             mock_client.return_value.update.assert_not_called()
 
     @mock.patch(
@@ -181,7 +461,7 @@ class SearchDocumentMixinTests:
     def test_delete_search_document(self, mock_client, test_obj: ExampleModel):
         """Test the delete_search_document clears the cache."""
         doc = test_obj.as_search_document(index="_all")
-        key = test_obj.search_document_cache_key
+        key = f"{test_obj.search_document_cache_key}:_all"
         cache.set(key, doc)
         assert cache.get(key) is not None
         test_obj.delete_search_document(index="_all")
@@ -241,6 +521,16 @@ class SearchDocumentManagerMixinTests:
         with pytest.raises(NotImplementedError):
             obj.get_search_queryset()
 
+    @mock.patch.object(ExampleModelManager, "get_search_queryset", autospec=True)
+    def test_iter_search_queryset(self, mock_qs):
+        """Test the iter_search_queryset method."""
+        mock_iterator = mock_qs.return_value.iterator
+        assert ExampleModel.objects.iter_search_queryset() == mock_iterator.return_value
+        mock_qs.assert_called_once_with(ExampleModel.objects, index="_all")
+        mock_iterator.assert_called_once_with(500)
+        ExampleModel.objects.iter_search_queryset("foo", chunk_size=10)
+        mock_iterator.assert_called_with(10)
+
     @mock.patch.object(ExampleModelManager, "get_search_queryset", autospec=True)
     def test_in_search_queryset(self, mock_qs):
         """Test the in_search_queryset method."""
@@ -267,6 +557,17 @@ class SearchDocumentManagerMixinTests:
         mock_qs.return_value.filter.return_value.using.assert_called_once_with("foo")
         mock_qs.return_value.filter.return_value.using.return_value.exists.assert_called_once_with()
 
+    @mock.patch.object(ExampleModelManager, "get_search_queryset", autospec=True)
+    def test_in_search_queryset_many(self, mock_qs):
+        """Test the in_search_queryset_many method."""
+        mock_using = mock_qs.return_value.filter.return_value.using
+        mock_using.return_value.values_list.return_value = [1, 2]
+        assert ExampleModel.objects.in_search_queryset_many([1, 2, 3]) == {1, 2}
+        mock_qs.assert_called_once_with(ExampleModel.objects, index="_all")
+        mock_qs.return_value.filter.assert_called_once_with(pk__in=[1, 2, 3])
+        mock_using.assert_called_once_with("foo")
+        mock_using.return_value.values_list.assert_called_once_with("pk", flat=True)
+
     @mock.patch("django.db.models.query.QuerySet", autospec=True)
     def test_from_search_query(self, mock_qs):
         """Test the from_search_query method."""
@@ -340,6 +641,13 @@ class SearchQueryTests:
         """Test the object_ids property."""
         obj = SearchQuery(hits=self.hits)
         assert set(obj.object_ids) == {"1", "2", "3"}
+        # the ids are only extracted once per set of hits
+        assert obj._hit_values("id") is obj._hit_values("id")
+        # but callers get a copy, so mutating it does not affect the cache
+        obj.object_ids.append("4")
+        assert set(obj.object_ids) == {"1", "2", "3"}
+        obj.hits = self.hits[:1]
+        assert obj.object_ids == ["1"]
 
     def test_save(self):
         """Try saving unserializable JSON."""
@@ -392,6 +700,14 @@ class SearchQueryTests:
         assert sq.max_score == 2
         assert sq.min_score == 1
 
+        # custom sorting results in null scores
+        sq.hits = [{"score": None}, {"score": 2}]
+        assert sq.max_score == 2
+        assert sq.min_score == 2
+        sq.hits = [{"score": None}]
+        assert sq.max_score == 0
+        assert sq.min_score == 0
+
     def test_has_highlights(self):
         sq = SearchQuery(query={"highlight": {}})
         assert sq.has_highlights
@@ -402,6 +718,57 @@ class SearchQueryTests:
         sq = SearchQuery(query={"highlight": {}}, hits=self.hits_with_highlights)
         assert sq.get_doc_highlights(1) == {"field1": ["bar"]}
 
+    def test_get_doc_rank(self):
+        sq = SearchQuery(hits=self.hits)
+        assert sq.get_doc_rank(1) == 0
+        assert sq.get_doc_rank("3") == 2
+        with pytest.raises(ValueError):
+            sq.get_doc_rank(4)
+        # replacing the hits invalidates the cached lookup
+        sq.hits = list(reversed(self.hits))
+        assert sq.get_doc_rank(1) == 2
+
+    def test_get_hit(self):
+        sq = SearchQuery(hits=self.hits)
+        assert sq.get_hit(2) == {"id": "2", "doc_type": "foo"}
+        assert sq.get_hit("3") == {"id": "3", "doc_type": "bar"}
+        with pytest.raises(KeyError):
+            sq.get_hit(4)
+
+    def test_search_annotations(self):
+        assert SearchQuery().search_annotations() is None
+        sq = SearchQuery(hits=[{"id": "1", "score": 2.0}, {"id": "2", "score": None}])
+        case_rank, case_score = sq.search_annotations("field_1")
+        assert [(w.condition.children, w.result.value) for w in case_rank.cases] == [
+            ([("field_1", "1")], 1),
+            ([("field_1", "2")], 2),
+        ]
+        # null scores are omitted from the score statement
+        assert [w.result.value for w in case_score.cases] == [2.0]
+        sq.hits = [{"id": "1", "score": None}]
+        _, score = sq.search_annotations()
+        assert isinstance(score, Value)
+        assert score.value is None
+
+    def test_search_rank_and_score_annotations(self):
+        assert SearchQuery().search_rank_annotation() is None
+        assert SearchQuery().search_score_annotation() is None
+        sq = SearchQuery(hits=[{"id": "1", "score": 2.0}, {"id": "2", "score": None}])
+        # each annotation is built independently of the other
+        with mock.patch.object(SearchQuery, "search_annotations") as mock_annotations:
+            case_rank = sq.search_rank_annotation("field_1")
+            case_score = sq.search_score_annotation("field_1")
+        mock_annotations.assert_not_called()
+        assert [(w.condition.children, w.result.value) for w in case_rank.cases] == [
+            ([("field_1", "1")], 1),
+            ([("field_1", "2")], 2),
+        ]
+        assert [w.result.value for w in case_score.cases] == [2.0]
+        sq.hits = [{"id": "1", "score": None}]
+        score = sq.search_score_annotation()
+        assert isinstance(score, Value)
+        assert score.value is None
+
 
 @pytest.mark.django_db
 class SearchResultsQuerySetTests:
@@ -427,6 +794,77 @@ class SearchResultsQuerySetTests:
         assert obj.search_rank == 1
         assert obj.search_score == 3.0
 
+    def test_from_search_results__null_scores(self) -> None:
+        hits = self.hits()
+        for hit in hits:
+            hit["score"] = None
+        model_a1 = ModelA.objects.create(field_1=hits[1]["id"], field_2="foo")
+        obj = ModelA.objects.from_search_results(SearchQuery(hits=hits)).get()
+        assert obj == model_a1
+        assert obj.search_rank == 2
+        assert obj.search_score is None
+
+    def test_from_search_results__related(self) -> None:
+        hits = self.hits()
+        model_a1 = ModelA.objects.create(field_1=hits[0]["id"], field_2="foo")
+        ModelB.objects.create(source=model_a1)
+        sq = SearchQuery(hits=hits)
+        with mock.patch.object(
+            ModelAQuerySet, "search_result_select_related", ("modelb",)
+        ), mock.patch.object(
+            ModelAQuerySet, "search_result_prefetch_related", ("modelb",)
+        ):
+            qs = ModelA.objects.from_search_results(sq)
+        assert qs.query.select_related == {"modelb": {}}
+        assert qs._prefetch_related_lookups == ("modelb",)
+        assert qs.get() == model_a1
+
+    def test_add_search_highlights(self) -> None:
+        hits = self.hits()
+        hits[0]["highlight"] = {"field_2": ["<em>foo</em>"]}
+        model_a1 = ModelA.objects.create(field_1=hits[0]["id"], field_2="foo")
+        sq = SearchQuery(query={"highlight": {}}, hits=hits)
+        obj_list = ModelA.objects.all().add_search_highlights(sq)
+        assert obj_list == [model_a1]
+        assert obj_list[0].search_highlights == {"field_2": ["<em>foo</em>"]}
+
+    def test_add_search_highlights__no_highlights(self) -> None:
+        sq = SearchQuery(query={"query": {"match_all": {}}}, hits=self.hits())
+        qs = ModelA.objects.all()
+        with CaptureQueriesContext(connection) as ctx:
+            assert qs.add_search_highlights(sq) is qs
+        assert len(ctx.captured_queries) == 0
+
+    def test_ordered_from_search_results(self) -> None:
+        hits = self.hits()
+        # create in reverse order so that db order != search rank
+        objs = [
+            ModelA.objects.create(field_1=hit["id"], field_2="foo")
+            for hit in reversed(hits)
+        ]
+        ModelA.objects.create(field_2="not in results")
+        sq = SearchQuery(hits=hits)
+        with CaptureQueriesContext(connection) as ctx:
+            results = ModelA.objects.ordered_from_search_results(sq)
+        assert len(ctx.captured_queries) == 1
+        assert results == list(reversed(objs))
+        assert [obj.search_rank for obj in results] == [1, 2, 3]
+        assert [obj.search_score for obj in results] == [3.0, 2.0, 1.0]
+        assert not hasattr(results[0], "search_highlights")
+
+    def test_ordered_from_search_results__highlights(self) -> None:
+        hits = self.hits()
+        hits[0]["highlight"] = {"field_2": ["<em>foo</em>"]}
+        model_a1 = ModelA.objects.create(field_1=hits[0]["id"], field_2="foo")
+        model_a2 = ModelA.objects.create(field_1=hits[1]["id"], field_2="bar")
+        sq = SearchQuery(query={"highlight": {}}, hits=hits)
+        with CaptureQueriesContext(connection) as ctx:
+            results = ModelA.objects.ordered_from_search_results(sq)
+        assert len(ctx.captured_queries) == 1
+        assert results == [model_a1, model_a2]
+        assert results[0].search_highlights == {"field_2": ["<em>foo</em>"]}
+        assert results[1].search_highlights is None
+
 
 @pytest.mark.django_db
 class SearchResponseParserTests:
@@ -470,6 +908,8 @@ class SearchResponseParserTests:
                 "highlight": {"country": ["<em>gb</em>"]},
             }
         ]
+        # hits are only parsed once
+        assert parser.hits is parser.hits
         assert parser.aggregations == {
             "countries": {
                 "doc_count_error_upper_bound": 0,
@@ -577,6 +1017,101 @@ class ExecuteFunctionTests:
         assert search.hits[0] == {"index": "foo", "id": "1", "score": 1.1}
         assert search.query_response == mock_search.return_value
 
+    @mock.patch("elasticsearch_django.models.RETAIN_QUERY_RESPONSE", False)
+    @mock.patch.object(Elasticsearch, "search")
+    def test_do_search__no_retain_response(self, mock_search: mock.MagicMock):
+        mock_search.return_value = mock.Mock(
+            spec=ObjectApiResponse,
+            body={"hits": {"total": {"value": 1, "relation": "eq"}, "hits": []}},
+        )
+        search = SearchQuery.do_search(index="index", query={"match_all": {}})
+        assert search.total_hits == 1
+        assert search.query_response is None
+
+    @mock.patch.object(Elasticsearch, "msearch")
+    def test_do_multi_search(self, mock_msearch: mock.MagicMock):
+        mock_msearch.return_value = mock.Mock(
+            spec=ObjectApiResponse,
+            body={
+                "responses": [
+                    {
+                        "hits": {
+                            "total": {"value": 168, "relation": "eq"},
+                            "hits": self.raw_hits,
+                        },
+                        "aggregations": self.aggregations,
+                    },
+                    {
+                        "hits": {"total": {"value": 0, "relation": "eq"}, "hits": []},
+                    },
+                ]
+            },
+        )
+        searches = SearchQuery.do_multi_search(
+            [("foo", {"match_all": {}}), ("bar", {"term": {"x": 1}})], size=10
+        )
+        mock_msearch.assert_called_once_with(
+            searches=[
+                {"index": "foo"},
+                {"query": {"match_all": {}}, "from": 0, "size": 10, "_source": True},
+                {"index": "bar"},
+                {"query": {"term": {"x": 1}}, "from": 0, "size": 10, "_source": True},
+            ]
+        )
+        assert [sq.index for sq in searches] == ["foo", "bar"]
+        assert searches[0].hits == self.clean_hits
+        assert searches[0].total_hits == 168
+        assert searches[0].aggregations == self.aggregations
+        assert searches[1].hits == []
+        assert searches[1].total_hits == 0
+        SearchQuery.objects.bulk_create(searches)
+        assert SearchQuery.objects.count() == 2
+        assert SearchQuery.do_multi_search([]) == []
+
+    @mock.patch.object(Elasticsearch, "msearch")
+    def test_do_multi_search__header_params(self, mock_msearch: mock.MagicMock):
+        mock_msearch.return_value = mock.Mock(
+            spec=ObjectApiResponse,
+            body={"responses": [{"hits": {"hits": []}}]},
+        )
+        searches = SearchQuery.do_multi_search(
+            [("foo", {"match_all": {}})], routing="user1", min_score=0.5, size=10
+        )
+        mock_msearch.assert_called_once_with(
+            searches=[
+                {"index": "foo", "routing": "user1"},
+                {
+                    "query": {"match_all": {}},
+                    "min_score": 0.5,
+                    "from": 0,
+                    "size": 10,
+                    "_source": True,
+                },
+            ]
+        )
+        assert "routing" not in searches[0].query
+
+    @mock.patch.object(Elasticsearch, "msearch")
+    def test_do_multi_search__error(self, mock_msearch: mock.MagicMock):
+        error = {"error": {"type": "index_not_found_exception"}, "status": 404}
+        meta = ApiResponseMeta(
+            status=200,
+            http_version="1.1",
+            headers=HttpHeaders(),
+            duration=0.1,
+            node=NodeConfig("http", "localhost", 9200),
+        )
+        mock_msearch.return_value = ObjectApiResponse(
+            body={"responses": [{"hits": {"hits": []}}, error]}, meta=meta
+        )
+        with pytest.raises(ApiError) as ex:
+            SearchQuery.do_multi_search(
+                [("foo", {"match_all": {}}), ("bar", {"match_all": {}})]
+            )
+        assert ex.value.message == "index_not_found_exception"
+        assert ex.value.status_code == 404
+        assert ex.value.body == error
+
     @mock.patch.object(Elasticsearch, "search")
     def test_do_search(self, mock_search):
         # lots of mocking to get around lack of ES server during tests
@@ -6,6 +6,7 @@ from django.test.utils import override_settings
 from elasticsearch import Elasticsearch
 
 from elasticsearch_django.settings import (
+    _get_client,
     auto_sync,
     get_client,
     get_connection_settings,
@@ -36,10 +37,17 @@ class SettingsFunctionTests:
     @mock.patch("elasticsearch_django.settings.get_connection_settings")
     def test_get_client(self, mock_conn):
         """Test the get_client function."""
+        _get_client.cache_clear()
         mock_conn.return_value = "http://foo:9200"
         client = get_client()
         assert len(client.transport.node_pool.all()) == 1
-        assert client.transport.node_pool.all()[0].base_url == mock_conn()
+        assert client.transport.node_pool.all()[0].base_url == "http://foo:9200"
+        # the client is created once per connection, however it is named
+        assert get_client() is client
+        assert get_client("default") is client
+        assert get_client(connection="default") is client
+        mock_conn.assert_called_once_with("default")
+        _get_client.cache_clear()
 
     @override_settings(SEARCH_SETTINGS=TEST_SETTINGS)
     def test_get_client__init(self):